@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""Documentation of the options shared by the plugins using the GitHub API client."""
+
+
+class ModuleDocFragment():
+    """Options of the shared GitHub API client."""
+
+    DOCUMENTATION = r'''
+options:
+  max_retries:
+    description:
+      - Number of times a request is retried after a server error, a secondary rate limit
+        or a connection error, with exponential backoff and jitter.
+      - A C(Retry-After) header sent by GitHub takes precedence over the backoff, it is waited
+        for at most I(rate_limit_wait) seconds.
+    type: int
+    default: 5
+  rate_limit_wait:
+    description:
+      - Maximum number of seconds to wait for the reset of an exhausted rate limit.
+      - If the rate limit resets later, the request fails instead.
+      - When less than a tenth of the limit, at most 50 requests, remain, they are spread evenly
+        until the reset, waiting at most I(rate_limit_wait) seconds per request.
+    type: int
+    default: 60
+  request_budget:
+    description:
+      - Maximum number of requests sent to GitHub in one run, retries included.
+      - Set to C(0) for no limit.
+    type: int
+    default: 0
+'''
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+"""Documentation of the options enabling the instrumentation of modules and plugins."""
+
+
+class ModuleDocFragment():
+    """Options of the opt-in instrumentation."""
+
+    DOCUMENTATION = r'''
+options:
+  trace:
+    description:
+      - Return the wall time of the phases of the module and counters like HTTP requests,
+        bytes read, cache hits and misses and parsed files as C(trace).
+      - Also enabled by setting the environment variable C(JOMRR_DEV_TRACE) to C(true) on the
+        managed node.
+    type: bool
+    default: false
+'''
+
+    PLUGIN = r'''
+options:
+  trace_file:
+    description:
+      - File a trace of each run is appended to as one JSON object per line, with the wall time
+        of the phases of the plugin and counters like HTTP requests, bytes read, cache hits and
+        misses and parsed files.
+      - Tracing is disabled if not set.
+    type: path
+    env:
+      - name: JOMRR_DEV_TRACE_FILE
+'''
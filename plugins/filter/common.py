@@ -1,17 +1,25 @@
 """
 Common filter plugins for Ansible.
 """
+import os
+import re
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
 import yaml
 from ansible.errors import AnsibleFilterError
 from ansible.parsing.yaml.objects import AnsibleUnicode
+from ansible.utils.display import Display
+from ansible_collections.jomrr.dev.plugins.module_utils.lintable_yaml import MyDumper
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import TRACE_FILE_ENV, Tracer
 
+try:
+    from yaml import CDumper
+except ImportError:
+    CDumper = None
+
+display = Display()
 
-class MyDumper(yaml.Dumper):
-    """
-    Custom YAML Dumper that increases indentation for nested collections.
-    """
-    def increase_indent(self, flow=False, indentless=False):
-        return super().increase_indent(flow, False)
 
 def ansible_unicode_representer(dumper, data):
     return dumper.represent_scalar('tag:yaml.org,2002:str', str(data))
@@ -19,21 +27,257 @@ def ansible_unicode_representer(dumper, data):
 # Register the representer with the Dumper
 MyDumper.add_representer(AnsibleUnicode, ansible_unicode_representer)
 
-def to_lintable_yaml(a, indent=2, sort_keys=False):
+if CDumper is not None:
+    class MyCDumper(CDumper):
+        """
+        libyaml backed Dumper, its output is re-indented to match MyDumper.
+        """
+
+    MyCDumper.add_representer(AnsibleUnicode, ansible_unicode_representer)
+else:
+    MyCDumper = None
+
+# Maximum number of memoized results of to_lintable_yaml
+MEMO_SIZE = 256
+
+# Maximum number of characters of all memoized results, their keys hold the same values
+MEMO_MAX_CHARS = 8 * 1024 * 1024
+
+# Line width at which both emitters start folding scalars
+BEST_WIDTH = 80
+
+# Leading indentation and sequence item markers of an emitted line
+ITEM_PREFIX_RE = re.compile(r' *(?:- +)*')
+
+# Strings both emitters write alike, libyaml measures the width of escaped ones differently
+PRINTABLE_ASCII_RE = re.compile('[\x20-\x7e]*')
+
+_memo = OrderedDict()
+_memo_chars = 0
+
+# Shared by the calls without a trace file, a disabled tracer records nothing
+_no_trace = Tracer()
+
+# The environment of the controller does not change during a run
+_env_trace_file = os.environ.get(TRACE_FILE_ENV)
+
+def _is_simple_key(key):
+    """
+    Check that both emitters write a mapping key inline instead of as a complex C(?) key.
+
+    The emitters differ for empty keys and count the length limit of 128 on the
+    escaped key, so keys that may come close to it are rejected.
+    """
+    if not isinstance(key, str):
+        return True
+    return 0 < len(key) < 100 and PRINTABLE_ASCII_RE.fullmatch(key) is not None
+
+def _plain_scalar(data):
+    """
+    Convert a scalar to its builtin type, e.g. a tagged or AnsibleUnicode string to str.
+
+    Returns:
+        A tuple of the plain value and its memo key, or None if data is not a scalar.
+    """
+    if data is None or isinstance(data, bool):
+        return data, (type(data), data)
+    if isinstance(data, str):
+        data = str(data)
+    elif isinstance(data, int):
+        data = int(data)
+    elif isinstance(data, float):
+        # repr tells 0.0 and -0.0 apart
+        data = float(data)
+        return data, (float, repr(data))
+    else:
+        return None
+    return data, (type(data), data)
+
+def _analyze(data, seen):
+    """
+    Walk a value once to build a plain copy, its memo key and the number of lines it is emitted as.
+
+    Templated values are subclasses of the builtin types, e.g. AnsibleMapping or
+    lazily templated dictionaries holding tagged strings. They are copied to plain
+    dicts, lists and scalars, which both emitters represent alike, collections
+    that are plain already are not copied. The memo key keeps the plain types and
+    the sharing of collections, as shared collections are emitted with anchors and
+    aliases. Values of other types are kept as they are and disable the memo and
+    the fast path.
+
+    Args:
+        data: The value to analyze.
+        seen: Mapping of the ids of visited collections to their index, original and copy.
+
+    Returns:
+        A tuple of the plain copy, the memo key or None if the value holds other
+        types, the number of block lines, or 0 if the value is emitted inline, and
+        whether libyaml emits the value like MyDumper.
+    """
+    scalar = _plain_scalar(data)
+    if scalar is not None:
+        plain, memo = scalar
+        # libyaml measures the width of escaped strings differently
+        fast = not isinstance(plain, str) or PRINTABLE_ASCII_RE.fullmatch(plain) is not None
+        return plain, memo, 0, fast
+    if isinstance(data, (bytes, bytearray)) or not isinstance(data, (Mapping, Sequence)):
+        return data, None, 0, False
+
+    index = len(seen)
+    if id(data) in seen:
+        index, _, copy = seen[id(data)]
+        # A collection containing itself refers to the original until its copy is done
+        return data if copy is None else copy, ('alias', index), 0, True
+    # The original is kept alive, so the id of a temporary value is not reused
+    seen[id(data)] = (index, data, None)
+
+    lines = 0
+    items = []
+    keyed = True
+    fast = True
+    if isinstance(data, Mapping):
+        pairs = []
+        for key, value in data.items():
+            # Keys are hashable, keys of other types are kept as they are
+            key_plain, key_memo = _plain_scalar(key) or (key, None)
+            value_copy, value_memo, value_lines, value_fast = _analyze(value, seen)
+            pairs.append((key_plain, value_copy))
+            items.append((key_memo, value_memo))
+            keyed = keyed and key_memo is not None and value_memo is not None
+            fast = fast and value_fast and key_memo is not None and _is_simple_key(key_plain)
+            lines += 1 + value_lines
+        plain = type(data) is dict and all(
+            copy[0] is key and copy[1] is value for copy, (key, value) in zip(pairs, data.items()))
+        copy = data if plain else dict(pairs)
+    else:
+        values = []
+        for value in data:
+            value_copy, value_memo, value_lines, value_fast = _analyze(value, seen)
+            values.append(value_copy)
+            items.append(value_memo)
+            keyed = keyed and value_memo is not None
+            fast = fast and value_fast
+            lines += value_lines or 1
+        plain = type(data) is list and all(copy is value for copy, value in zip(values, data))
+        copy = data if plain else values
+    seen[id(data)] = (index, data, copy)
+    return copy, (type(copy), tuple(items)) if keyed else None, lines, keyed and fast
+
+def _indent_sequences(text, indent):
+    """
+    Indent the sequences libyaml emits indentless in mappings, as MyDumper does.
+
+    Args:
+        text: The YAML string emitted by libyaml.
+        indent: The number of spaces used for indentation.
+
+    Returns:
+        The re-indented YAML string, or None if a line exceeds the width at which
+        MyDumper would have folded it.
+    """
+    lines = text.split('\n')
+    result = []
+    sequences = []
+    for index, line in enumerate(lines[:-1]):
+        content = line.lstrip(' ')
+        column = len(line) - len(content)
+        while sequences and (column < sequences[-1] or
+                             (column == sequences[-1] and not content.startswith('- '))):
+            sequences.pop()
+        if sequences:
+            line = ' ' * (indent * len(sequences)) + line
+            if len(line) > BEST_WIDTH:
+                return None
+        result.append(line)
+
+        key_column = ITEM_PREFIX_RE.match(lines[index]).end()
+        following = lines[index + 1]
+        if following.startswith('- ', key_column) and \
+                len(following) - len(following.lstrip(' ')) == key_column:
+            sequences.append(key_column)
+    result.append(lines[-1])
+    return '\n'.join(result)
+
+def _dump_fast(a, lines, indent, sort_keys):
+    """
+    Dump a collection with libyaml, returns None if the output would differ from MyDumper.
+    """
+    text = yaml.dump(a, Dumper=MyCDumper, default_flow_style=False, indent=indent,
+                     sort_keys=sort_keys)
+    # Additional lines are folded or multi-line scalars, left to MyDumper
+    if text.count('\n') != lines:
+        return None
+    return _indent_sequences(text, indent)
+
+def _to_lintable_yaml(a, indent, sort_keys, memoize, tracer):
+    """
+    Convert a Python object into a YAML string, see to_lintable_yaml.
+    """
+    global _memo_chars  # pylint: disable=global-statement
+    with tracer.phase('analyze'):
+        data, memo_key, lines, fast = _analyze(a, {})
+
+    if memoize and memo_key is not None:
+        memo_key = (memo_key, indent, sort_keys)
+        if memo_key in _memo:
+            _memo.move_to_end(memo_key)
+            tracer.count('memo_hits')
+            return _memo[memo_key]
+        tracer.count('memo_misses')
+
+    result = None
+    if MyCDumper is not None and fast and lines:
+        with tracer.phase('dump_fast'):
+            result = _dump_fast(data, lines, indent, sort_keys)
+        tracer.count('fast_path' if result is not None else 'fast_path_fallbacks')
+    if result is None:
+        with tracer.phase('dump'):
+            result = yaml.dump(data, Dumper=MyDumper, default_flow_style=False, indent=indent,
+                               sort_keys=sort_keys)
+    tracer.count('chars_written', len(result))
+
+    # Results too large for the memo are not kept, they would evict all others
+    if memoize and memo_key is not None and len(result) <= MEMO_MAX_CHARS // 4:
+        _memo[memo_key] = result
+        _memo_chars += len(result)
+        while len(_memo) > MEMO_SIZE or _memo_chars > MEMO_MAX_CHARS:
+            _memo_chars -= len(_memo.popitem(last=False)[1])
+            tracer.count('memo_evictions')
+    return result
+
+def to_lintable_yaml(a, indent=2, sort_keys=False, memoize=False, trace_file=None):
     """
     An Ansible filter to convert a Python object into a nicely formatted YAML string.
+
+    Templated values are converted to plain types first. Collections are emitted
+    with libyaml if available, other values and output libyaml would format
+    differently fall back to MyDumper.
+
     Args:
         a: The Python object to convert.
         indent: The number of spaces to use for indentation.
+        sort_keys: Whether to sort the keys of mappings.
+        memoize: Whether to reuse the result of a previous call with an identical object.
+        trace_file: File a trace of the call is appended to as one JSON line,
+            defaults to the JOMRR_DEV_TRACE_FILE environment variable.
 
     Returns:
         A YAML string representation of the Python object.
     """
+    trace_file = trace_file or _env_trace_file
+    tracer = Tracer(enabled=True) if trace_file else _no_trace
     try:
-        return yaml.dump(a, Dumper=MyDumper, default_flow_style=False, indent=indent, sort_keys=sort_keys)
+        result = _to_lintable_yaml(a, indent, sort_keys, memoize, tracer)
     except Exception as e:
         raise AnsibleFilterError("to_lintable_yaml filter plugin error: %s" % str(e)) from e
 
+    if trace_file:
+        try:
+            tracer.write(trace_file, plugin='jomrr.dev.to_lintable_yaml')
+        except OSError as e:
+            display.warning(f"Unable to write trace file {trace_file}: {e}")
+    return result
+
 class FilterModule():
     """
     Defines a filter module class that Ansible will auto-detect and use.
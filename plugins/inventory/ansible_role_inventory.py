@@ -9,11 +9,25 @@ It uses the localdir connection method to manage the discovered directories
 as inventory hosts.
 """
 
+import json
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
 
-#import yaml
+import yaml
 from ansible.errors import AnsibleError
-from ansible.plugins.inventory import BaseInventoryPlugin
+from ansible.module_utils.common.json import AnsibleJSONEncoder
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable
+from ansible.utils.display import Display
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import Tracer
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+display = Display()
 
 DOCUMENTATION = '''
     name: ansible_role_inventory
@@ -22,15 +36,103 @@ DOCUMENTATION = '''
     description:
         - This inventory plugin lists directories under a given path that match a configurable prefix.
         - Only the substring of the directory name following the prefix is added as the inventory host.
+        - Each base path is scanned one directory level at a time, directories matching the prefix
+          are never descended into, so the scan cost depends on the number of roles only.
+        - Optionally each role's C(meta/main.yml) C(galaxy_tags) are used as groups and its
+          C(defaults/main.yml) and C(meta/argument_specs.yml) are exposed as host variables.
+          The files are parsed concurrently, with the libyaml based loader if available.
+        - Parsed role files are kept in an index in I(metadata_index_dir), only files whose
+          modification time, size and content hash changed are parsed again.
+        - With I(cache) enabled the discovered hosts are stored through the configured cache plugin
+          and reused as long as none of the scanned directories and read role files has changed.
+        - With I(dependency_levels) enabled the C(dependencies) of each role's C(meta/main.yml) form
+          a dependency graph of the discovered roles. Each host gets its topological level, roles on
+          the same level do not depend on each other and can be processed in parallel once the
+          roles of all lower levels are done.
+        - With I(trace_file) set, the time spent in the cache lookup, the scan, parsing the role files
+          and the index is appended to a trace file, with the number of scanned directories, parsed
+          files, bytes read and cache and index hits.
+    extends_documentation_fragment:
+        - inventory_cache
+        - jomrr.dev.trace.plugin
     options:
         base_path:
-            description: The base path to search for directories.
+            description:
+                - The base path to search for directories.
+                - A list of paths or a comma separated string searches several base paths.
             required: true
-            type: str
+            type: list
+            elements: str
         search_prefix:
             description: The prefix to search for in directory names.
             required: false
             type: str
+        search_depth:
+            description:
+                - Number of directory levels below the base path to search for matching directories.
+                - Directories not matching the prefix are descended into until this depth is reached,
+                  hidden directories are skipped.
+            required: false
+            type: int
+            default: 1
+        galaxy_tag_groups:
+            description:
+                - Add each host to a group per C(galaxy_tags) entry of the role's C(meta/main.yml).
+            required: false
+            type: bool
+            default: false
+        galaxy_tag_group_prefix:
+            description:
+                - Prefix for the groups created from C(galaxy_tags), avoids clashes with host names.
+            required: false
+            type: str
+            default: tag_
+        role_defaults:
+            description:
+                - Expose the content of the role's C(defaults/main.yml) as host variable C(role_defaults).
+            required: false
+            type: bool
+            default: false
+        dependency_levels:
+            description:
+                - Resolve the C(dependencies) of each role's C(meta/main.yml) to the discovered hosts
+                  and add each host to a group per topological level, e.g. C(level_0) for roles
+                  without dependencies and C(level_1) for roles depending on C(level_0) roles only.
+                - The level is exposed as host variable C(role_dependency_level) and the resolved
+                  dependencies as C(role_dependencies).
+                - Dependencies are given as role name, as C(namespace.collection.role), as path or
+                  as dictionary with a C(role) or C(name) key. I(search_prefix) is stripped from
+                  their names. Dependencies on roles not in the inventory are ignored.
+                - Parsing fails if the dependencies form a cycle.
+            required: false
+            type: bool
+            default: false
+        dependency_level_group_prefix:
+            description:
+                - Prefix for the groups created from the topological levels.
+            required: false
+            type: str
+            default: level_
+        role_argument_specs:
+            description:
+                - Expose the content of the role's C(meta/argument_specs.yml) as host variable
+                  C(role_argument_specs).
+            required: false
+            type: bool
+            default: false
+        metadata_workers:
+            description:
+                - Maximum number of roles whose files are read and parsed concurrently.
+            required: false
+            type: int
+            default: 8
+        metadata_index_dir:
+            description:
+                - Directory for the index of parsed role files, one index file per inventory source.
+                - Set to an empty string to disable the index.
+            required: false
+            type: str
+            default: ~/.ansible/tmp/ansible_role_inventory
 '''
 
 EXAMPLES = '''
@@ -42,9 +144,48 @@ inventory_plugins = ./plugins/inventories
 plugin: ansible_role_inventory
 base_path: /path/to/search
 search_prefix: ansible-role-
+
+# Example inventory file reusing the scan results between runs
+plugin: ansible_role_inventory
+base_path: /path/to/search
+search_prefix: ansible-role-
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: ~/.ansible/tmp/ansible_role_inventory
+cache_timeout: 86400
+
+# Example inventory file for roles nested in namespace directories of several checkouts
+plugin: ansible_role_inventory
+base_path:
+  - ~/src/ansible/roles
+  - ~/src/work/roles
+search_prefix: ansible-role-
+search_depth: 2
+
+# Example inventory file grouping roles by galaxy_tags and exposing their defaults
+plugin: ansible_role_inventory
+base_path: ~/src/ansible/roles
+search_prefix: ansible-role-
+galaxy_tag_groups: true
+role_defaults: true
+
+# Example inventory file grouping roles by their level in the role dependency graph,
+# a play per group level_0, level_1, ... processes the roles in dependency order
+plugin: ansible_role_inventory
+base_path: ~/src/ansible/roles
+search_prefix: ansible-role-
+dependency_levels: true
 '''
 
-class InventoryModule(BaseInventoryPlugin):
+# Role files read for the metadata options, relative to the role directory
+META_FILE = os.path.join('meta', 'main.yml')
+DEFAULTS_FILE = os.path.join('defaults', 'main.yml')
+ARGUMENT_SPECS_FILE = os.path.join('meta', 'argument_specs.yml')
+
+# Bump when the layout of the role file index changes
+INDEX_VERSION = 1
+
+class InventoryModule(BaseInventoryPlugin, Cacheable):
     """
     Inventory plugin to list directories starting with ansible-role- under
     a given path using localdir connection plugin.
@@ -52,6 +193,9 @@ class InventoryModule(BaseInventoryPlugin):
 
     NAME = 'ansible_role_inventory'
 
+    # Replaced by parse, disabled until then
+    _tracer = Tracer()
+
     def verify_file(self, path):
         """
         Verify if the given file is valid for this plugin.
@@ -69,47 +213,408 @@ class InventoryModule(BaseInventoryPlugin):
         super().parse(inventory, loader, path)
 
         self._read_config_data(path)
+        trace_file = self.get_option('trace_file')
+        self._tracer = Tracer(enabled=bool(trace_file))
 
-        base_path = self.get_option('base_path')
         search_prefix = self.get_option('search_prefix') or ''
+        search_depth = self.get_option('search_depth')
+
+        base_paths = []
+        for base_path in self.get_option('base_path'):
+            if base_path.startswith('~'):
+                base_path = os.path.expanduser(base_path)
+            if not os.path.isdir(base_path):
+                raise AnsibleError(f"Base path {base_path} is not a directory or does not exist.")
+            base_paths.append(base_path)
+
+        cache_key = self.get_cache_key(path)
+        settings = {
+            'base_paths': base_paths,
+            'search_prefix': search_prefix,
+            'search_depth': search_depth,
+            'role_files': self._role_files(),
+            # Options sharing a role file change the hosts without changing role_files
+            'galaxy_tag_groups': self.get_option('galaxy_tag_groups'),
+            'role_defaults': self.get_option('role_defaults'),
+            'role_argument_specs': self.get_option('role_argument_specs'),
+            'galaxy_tag_group_prefix': self.get_option('galaxy_tag_group_prefix'),
+            'dependency_levels': self.get_option('dependency_levels'),
+            'dependency_level_group_prefix': self.get_option('dependency_level_group_prefix'),
+        }
+
+        # Read the cache only if the inventory cache is enabled and not being refreshed
+        user_cache_setting = self.get_option('cache')
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        hosts = None
+        if attempt_to_read_cache:
+            with self._tracer.phase('cache_lookup'):
+                try:
+                    cached = self._cache[cache_key]
+                except KeyError:
+                    cache_needs_update = True
+                else:
+                    if cached.get('settings') == settings and \
+                            self._is_unchanged(cached.get('scanned')):
+                        hosts = cached['hosts']
+                    else:
+                        cache_needs_update = True
+            self._tracer.count('cache_misses' if hosts is None else 'cache_hits')
+
+        if hosts is None:
+            hosts, scanned = self._discover_hosts(
+                base_paths, search_prefix, search_depth, self._index_path(cache_key)
+            )
+            if cache_needs_update:
+                with self._tracer.phase('cache_update'):
+                    self._cache[cache_key] = {
+                        'settings': settings, 'scanned': scanned, 'hosts': hosts
+                    }
+
+        with self._tracer.phase('populate'):
+            self._populate(hosts)
+        self._tracer.count('hosts', len(hosts))
+
+        if trace_file:
+            try:
+                self._tracer.write(trace_file, plugin=f"jomrr.dev.{self.NAME}", source=path)
+            except OSError as e:
+                display.warning(f"Unable to write trace file {trace_file}: {e}")
+
+    @staticmethod
+    def _is_unchanged(scanned):
+        """
+        Checks that none of the scanned directories and read files changed since the scan.
+
+        The modification time of a directory changes whenever an entry
+        is added to, removed from or renamed in it. Files that did not
+        exist at scan time are recorded with None.
+        """
+        if not scanned:
+            return False
+        for path, mtime_ns in scanned.items():
+            try:
+                current = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                current = None
+            except OSError:
+                return False
+            if current != mtime_ns:
+                return False
+        return True
+
+    def _role_files(self):
+        """
+        Returns the role files that need to be read for the enabled options.
+        """
+        role_files = []
+        if self.get_option('galaxy_tag_groups') or self.get_option('dependency_levels'):
+            role_files.append(META_FILE)
+        if self.get_option('role_defaults'):
+            role_files.append(DEFAULTS_FILE)
+        if self.get_option('role_argument_specs'):
+            role_files.append(ARGUMENT_SPECS_FILE)
+        return role_files
+
+    def _index_path(self, cache_key):
+        """
+        Returns the path of the role file index of this inventory source, or None.
+        """
+        index_dir = self.get_option('metadata_index_dir')
+        if not index_dir:
+            return None
+        return os.path.join(os.path.expanduser(index_dir), f"{cache_key}.json")
+
+    def _discover_hosts(self, base_paths, search_prefix, search_depth, index_path=None):
+        """
+        Returns a dict mapping each discovered host to its groups and variables,
+        and a dict mapping each scanned directory and read file to its modification time.
+        """
+        hosts = {}
+        scanned = {}
+        with self._tracer.phase('scan'):
+            for base_path in base_paths:
+                group = base_path.split('/')[-2]
+                for role_path in self._scan(base_path, search_prefix, search_depth, scanned):
+                    # Extract the part of the directory name following the search prefix
+                    host_name = os.path.basename(role_path)[len(search_prefix):]
+                    hosts[host_name] = {
+                        'groups': [group],
+                        'vars': {
+                            'ansible_connection': 'local',
+                            'ansible_host': role_path,
+                            'ansible_python_interpreter': '/usr/bin/python3',
+                        },
+                    }
+        self._tracer.count('directories_scanned', len(scanned))
+
+        role_files = self._role_files()
+        if role_files and hosts:
+            with self._tracer.phase('index_load'):
+                index = self._load_index(index_path) if index_path else {}
+            updated_index = {}
+            with self._tracer.phase('role_files'), \
+                    ThreadPoolExecutor(max_workers=self.get_option('metadata_workers')) as executor:
+                results = executor.map(
+                    lambda role_path: self._load_role_files(
+                        role_path, role_files, index.get(role_path, {}), self._tracer
+                    ),
+                    [host['vars']['ansible_host'] for host in hosts.values()]
+                )
+                for host, (contents, stats, entry) in zip(hosts.values(), results):
+                    scanned.update(stats)
+                    updated_index[host['vars']['ansible_host']] = entry
+                    self._apply_role_files(host, contents)
+            if index_path and updated_index != index:
+                with self._tracer.phase('index_save'):
+                    self._save_index(index_path, updated_index)
+
+        if self.get_option('dependency_levels'):
+            with self._tracer.phase('dependency_levels'):
+                self._apply_dependency_levels(hosts, search_prefix)
+
+        return hosts, scanned
+
+    @staticmethod
+    def _load_index(index_path):
+        """
+        Loads the role file index, returns an empty index if it is missing or outdated.
+        """
+        try:
+            with open(index_path, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+            return {}
+        return index.get('roles') or {}
+
+    @staticmethod
+    def _save_index(index_path, roles):
+        """
+        Atomically replaces the role file index.
+        """
+        index_dir = os.path.dirname(index_path)
+        try:
+            os.makedirs(index_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=index_dir, prefix='.', suffix='.json')
+        except OSError as e:
+            display.warning(f"Unable to write role file index {index_path}: {e}")
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'version': INDEX_VERSION, 'roles': roles}, file, cls=AnsibleJSONEncoder)
+            os.replace(tmp_path, index_path)
+        except (OSError, TypeError, ValueError) as e:
+            display.warning(f"Unable to write role file index {index_path}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _load_role_files(role_path, role_files, indexed, tracer):
+        """
+        Parses the given files of a role, reusing the indexed content of unchanged files.
+
+        A file is unchanged if its modification time and size match the index,
+        or else if the hash of its content matches the index. Reads, parses and
+        index hits are counted by tracer.
+
+        Returns:
+            A dict mapping each existing file to its content, a dict mapping
+            each file path to its modification time or None, and the updated
+            index entry of the role.
+        """
+        contents = {}
+        stats = {}
+        entry = {}
+        for role_file in role_files:
+            file_path = os.path.join(role_path, role_file)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                stats[file_path] = None
+                continue
+            stats[file_path] = stat.st_mtime_ns
 
-        if base_path.startswith('~'):
-            base_path = os.path.expanduser(base_path)
-
-        if not os.path.isdir(base_path):
-            raise AnsibleError(f"Base path {base_path} is not a directory or does not exist.")
-
-        for root, dirs, _ in os.walk(base_path):
-            if root == base_path:
-                for dir_name in dirs:
-                    if search_prefix == '' or dir_name.startswith(search_prefix):
-                        # Extract the part of the directory name following the search prefix
-                        host_name = dir_name[len(search_prefix):]
-                        # meta_path = os.path.join(root, dir_name, "meta", "main.yml")
-                        # if os.path.exists(meta_path):
-                        #     with open(meta_path, 'r', encoding='utf-8') as meta_file:
-                        #         try:
-                        #             meta_content = yaml.safe_load(meta_file) or {}
-                        #             galaxy_tags = meta_content.get(
-                        #                 'galaxy_info', {}).get('galaxy_tags', [])
-                        #             if galaxy_tags:
-                        #                 for tag in galaxy_tags:
-                        #                     self.inventory.add_group(tag)
-                        #                     self.inventory.add_host(host_name, group=tag)
-                        #         except yaml.YAMLError as e:
-                        #             raise AnsibleError(f"Error reading {meta_path}: {e}") from e
-                        group = root.split('/')[-2]
-                        self.inventory.add_group(group)
-                        self.inventory.add_host(host_name, group=group)
-                        self.inventory.set_variable(host_name,
-                                                    'ansible_connection',
-                                                    'local')
-                        self.inventory.set_variable(host_name,
-                                                    'ansible_host',
-                                                    os.path.join(root, dir_name))
-                        self.inventory.set_variable(host_name,
-                                                    'ansible_python_interpreter',
-                                                    '/usr/bin/python3')
+            known = indexed.get(role_file)
+            if known and known.get('stat') == [stat.st_mtime_ns, stat.st_size]:
+                entry[role_file] = known
+                tracer.count('index_hits')
+            else:
+                try:
+                    with open(file_path, 'rb') as file:
+                        data = file.read()
+                except FileNotFoundError:
+                    stats[file_path] = None
+                    continue
+                tracer.count('bytes_read', len(data))
+                digest = sha256(data).hexdigest()
+                if known and known.get('sha256') == digest:
+                    content = known.get('content')
+                    tracer.count('index_hash_hits')
+                else:
+                    try:
+                        content = yaml.load(data, Loader=SafeLoader)
+                    except yaml.YAMLError as e:
+                        raise AnsibleError(f"Error reading {file_path}: {e}") from e
+                    tracer.count('files_parsed')
+                entry[role_file] = {
+                    'stat': [stat.st_mtime_ns, stat.st_size],
+                    'sha256': digest,
+                    'content': content,
+                }
+            contents[role_file] = entry[role_file]['content']
+        return contents, stats, entry
+
+    def _apply_role_files(self, host, contents):
+        """
+        Adds the groups and variables derived from the role files to a host.
+        """
+        if self.get_option('galaxy_tag_groups'):
+            meta = contents.get(META_FILE)
+            galaxy_info = meta.get('galaxy_info') if isinstance(meta, dict) else None
+            galaxy_tags = galaxy_info.get('galaxy_tags') if isinstance(galaxy_info, dict) else None
+            prefix = self.get_option('galaxy_tag_group_prefix') or ''
+            for tag in galaxy_tags or []:
+                host['groups'].append(self._sanitize_group_name(f"{prefix}{tag}"))
+        if self.get_option('dependency_levels'):
+            host['vars']['role_dependencies'] = self._dependency_names(contents.get(META_FILE))
+        if self.get_option('role_defaults'):
+            host['vars']['role_defaults'] = contents.get(DEFAULTS_FILE) or {}
+        if self.get_option('role_argument_specs'):
+            host['vars']['role_argument_specs'] = contents.get(ARGUMENT_SPECS_FILE) or {}
+
+    @staticmethod
+    def _dependency_names(meta):
+        """
+        Returns the names of the roles listed in the dependencies of a role's meta data.
+        """
+        dependencies = meta.get('dependencies') if isinstance(meta, dict) else None
+        names = []
+        for dependency in dependencies if isinstance(dependencies, list) else []:
+            if isinstance(dependency, dict):
+                dependency = dependency.get('role') or dependency.get('name')
+            if isinstance(dependency, str) and dependency:
+                names.append(dependency)
+        return names
+
+    @staticmethod
+    def _resolve_dependency(name, hosts, search_prefix):
+        """
+        Returns the host of the role a dependency refers to, or None if it is not in the inventory.
+
+        The name is tried as given, as path basename and without the
+        namespace.collection of a fully qualified name, each with and
+        without the search prefix.
+        """
+        basename = os.path.basename(name.rstrip('/'))
+        for candidate in (name, basename, basename.rsplit('.', 1)[-1]):
+            if search_prefix and candidate.startswith(search_prefix):
+                candidate = candidate[len(search_prefix):]
+            if candidate in hosts:
+                return candidate
+        return None
+
+    def _apply_dependency_levels(self, hosts, search_prefix):
+        """
+        Resolves the dependencies of the hosts and adds each host to the group of its level.
+
+        The level of a role is 0 without dependencies in the inventory and one
+        more than the highest level of its dependencies otherwise, computed
+        wave by wave with Kahn's algorithm.
+
+        Raises:
+            AnsibleError: If the dependencies form a cycle.
+        """
+        dependents = {host_name: [] for host_name in hosts}
+        pending = {}
+        for host_name, host in hosts.items():
+            resolved = []
+            for name in host['vars'].get('role_dependencies', []):
+                dependency = self._resolve_dependency(name, hosts, search_prefix)
+                if dependency is not None and dependency not in resolved:
+                    resolved.append(dependency)
+            host['vars']['role_dependencies'] = resolved
+            pending[host_name] = len(resolved)
+            for dependency in resolved:
+                dependents[dependency].append(host_name)
+
+        levels = {}
+        wave = [host_name for host_name, count in pending.items() if count == 0]
+        level = 0
+        while wave:
+            next_wave = []
+            for host_name in wave:
+                levels[host_name] = level
+                for dependent in dependents[host_name]:
+                    pending[dependent] -= 1
+                    if pending[dependent] == 0:
+                        next_wave.append(dependent)
+            wave = next_wave
+            level += 1
+
+        if len(levels) < len(hosts):
+            raise AnsibleError(
+                f"Role dependency cycle: {' -> '.join(self._find_cycle(hosts, levels))}."
+            )
+
+        prefix = self.get_option('dependency_level_group_prefix') or ''
+        for host_name, host in hosts.items():
+            host['vars']['role_dependency_level'] = levels[host_name]
+            host['groups'].append(self._sanitize_group_name(f"{prefix}{levels[host_name]}"))
+        self._tracer.count('dependency_levels', level)
+
+    @staticmethod
+    def _find_cycle(hosts, levels):
+        """
+        Returns the hosts of a dependency cycle among the hosts without a level.
+
+        Every host left without a level has a dependency without a level,
+        so following them always leads into a cycle.
+        """
+        host_name = next(host_name for host_name in hosts if host_name not in levels)
+        path = []
+        positions = {}
+        while host_name not in positions:
+            positions[host_name] = len(path)
+            path.append(host_name)
+            dependencies = hosts[host_name]['vars']['role_dependencies']
+            host_name = next(dependency for dependency in dependencies if dependency not in levels)
+        return path[positions[host_name]:] + [host_name]
+
+    def _scan(self, path, search_prefix, depth, scanned):
+        """
+        Yields the directories below path whose names start with search_prefix.
+
+        Uses the file type cached in the directory entries, so only directories
+        on the way to the matching directories are read.
+        """
+        scanned[path] = os.stat(path).st_mtime_ns
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                if search_prefix == '' or entry.name.startswith(search_prefix):
+                    yield entry.path
+                elif depth > 1 and not entry.name.startswith('.'):
+                    subdirs.append(entry.path)
+        for subdir in subdirs:
+            yield from self._scan(subdir, search_prefix, depth - 1, scanned)
+
+    def _populate(self, hosts):
+        """
+        Adds the discovered hosts with their groups and variables to the inventory.
+        """
+        for host_name, host in hosts.items():
+            for group in host['groups']:
+                self.inventory.add_group(group)
+                self.inventory.add_host(host_name, group=group)
+            for var_name, value in host['vars'].items():
+                self.inventory.set_variable(host_name, var_name, value)
 
 def main():
     """
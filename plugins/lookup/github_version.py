@@ -1,8 +1,19 @@
 """Lookup plugin to get the latest release version of a GitHub repo."""
 
-import requests
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+
 from ansible.errors import AnsibleError
+from ansible.plugins.loader import cache_loader
 from ansible.plugins.lookup import LookupBase
+from ansible.utils.display import Display
+from ansible_collections.jomrr.dev.plugins.module_utils.github import GitHubClient, GitHubError
+from ansible_collections.jomrr.dev.plugins.module_utils.locking import LockTimeout, file_lock
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import Tracer
+
+display = Display()
 
 DOCUMENTATION = """
     name: github_version
@@ -11,53 +22,319 @@ DOCUMENTATION = """
     short_description: get the latest release version of a GitHub repo
     description:
         - This lookup returns the latest release version of a specified GitHub repository.
+        - Several repositories can be resolved in one call, given as C(owner/repo) strings or
+          C([owner, repo]) pairs. They are fetched concurrently over a shared connection pool
+          and the versions are returned in input order.
+        - Versions are cached per user_or_org and repo through an Ansible cache plugin,
+          so repeated lookups within a run and across runs are served locally.
+        - With a file based cache plugin a missing version is fetched by one process only,
+          concurrent forks wait for a lock in the cache directory and reuse the result.
+        - With I(trace_file) set, the time spent in the cache and the GitHub API and the number of
+          cache hits and misses, requests and bytes read of each call are appended to a trace file.
     options:
-      github_token:
-        description: GitHub personal access token for authentication.
-        required: True
-      user_or_org:
-        description: The GitHub user or organization name.
-        required: True
-      repo:
-        description: The repository name.
+      _terms:
+        description:
+          - The GitHub personal access token for authentication, the GitHub user or
+            organization name and the repository name, in this order.
+          - Alternatively the token followed by any number of repositories given as
+            C(owner/repo) strings or C([owner, repo]) pairs. The token is omitted
+            if it is passed with the I(github_token) option.
         required: True
+      github_token:
+        description:
+          - GitHub personal access token for authentication.
+          - If set, all terms are treated as repositories.
+        type: str
+      api_url:
+        description:
+          - Base URL of the GitHub REST API, e.g. of a GitHub Enterprise Server.
+        type: str
+        default: https://api.github.com
+        env:
+          - name: ANSIBLE_GITHUB_VERSION_API_URL
+        ini:
+          - section: github_version_lookup
+            key: api_url
+      workers:
+        description:
+          - Maximum number of repositories resolved concurrently.
+        type: int
+        default: 8
+      cache_plugin:
+        description:
+          - Cache plugin used to store the looked up versions,
+            e.g. C(ansible.builtin.jsonfile) or C(ansible.builtin.memory).
+          - Versions are cached per I(api_url).
+        type: str
+        default: ansible.builtin.jsonfile
+        env:
+          - name: ANSIBLE_GITHUB_VERSION_CACHE_PLUGIN
+        ini:
+          - section: github_version_lookup
+            key: cache_plugin
+      cache_connection:
+        description:
+          - Cache connection data or path, read cache plugin documentation for specifics.
+        type: str
+        default: ~/.ansible/tmp/github_version
+        env:
+          - name: ANSIBLE_GITHUB_VERSION_CACHE_CONNECTION
+        ini:
+          - section: github_version_lookup
+            key: cache_connection
+      cache_timeout:
+        description:
+          - Time in seconds a cached version is considered valid.
+          - Set to C(0) to disable caching.
+        type: int
+        default: 3600
+        env:
+          - name: ANSIBLE_GITHUB_VERSION_CACHE_TIMEOUT
+        ini:
+          - section: github_version_lookup
+            key: cache_timeout
+      cache_max_entries:
+        description:
+          - Maximum number of cached versions, the oldest entries are evicted first.
+        type: int
+        default: 1000
+        env:
+          - name: ANSIBLE_GITHUB_VERSION_CACHE_MAX_ENTRIES
+        ini:
+          - section: github_version_lookup
+            key: cache_max_entries
+      lock_timeout:
+        description:
+          - Maximum number of seconds to wait for another process fetching the same version.
+        type: int
+        default: 60
+        env:
+          - name: ANSIBLE_GITHUB_VERSION_LOCK_TIMEOUT
+        ini:
+          - section: github_version_lookup
+            key: lock_timeout
+    extends_documentation_fragment:
+      - jomrr.dev.github
+      - jomrr.dev.trace.plugin
     requirements:
-        - requests
+        - requests (optional, keeps the connections to GitHub alive across requests)
 """
 
+EXAMPLES = """
+- name: Get the latest release of a repository
+  ansible.builtin.debug:
+    msg: "{{ lookup('jomrr.dev.github_version', github_token, 'jomrr', 'ansible-role-example') }}"
+
+- name: Get the latest releases of many repositories in one call
+  ansible.builtin.debug:
+    msg: "{{ query('jomrr.dev.github_version', 'jomrr/ansible-role-a', ['jomrr', 'ansible-role-b'],
+                   github_token=github_token, workers=16) }}"
+
+- name: Keep versions in memory only and refresh them every 10 minutes
+  ansible.builtin.debug:
+    msg: "{{ lookup('jomrr.dev.github_version', github_token, 'jomrr', 'ansible-role-example',
+                    cache_plugin='ansible.builtin.memory', cache_timeout=600) }}"
+"""
+
+RETURN = """
+  _raw:
+    description:
+      - The tag names of the latest releases in the order of the given repositories,
+        C(0.0.0) for repositories without releases.
+    type: list
+    elements: str
+"""
+
+# Cache plugin instances are kept for the lifetime of the process, so lookups
+# within the same worker are answered from the plugin's in-memory state.
+_CACHES = {}
+
 class LookupModule(LookupBase):
     """Lookup plugin to get the latest release version of a GitHub repo."""
+
+    # Replaced by run, disabled until then
+    _tracer = Tracer()
+
     def run(self, terms, variables=None, **kwargs):
 
-        if not isinstance(terms, list) or len(terms) != 3:
+        if not isinstance(terms, list) or not terms:
             raise AnsibleError(
-                "github_version lookup expects a list of three items:" + \
-                     " github_token, user_or_org, and repo."
+                "github_version lookup expects a list of items:" + \
+                     " github_token, user_or_org, and repo or a list of repositories."
             )
 
-        github_token, user_or_org, repo = terms
+        self.set_options(var_options=variables, direct=kwargs)
 
-        headers = {
-            "Authorization": f"token {github_token}",
-            "Accept": "application/vnd.github.v3+json",
-        }
+        github_token = self.get_option('github_token')
+        if github_token is None:
+            github_token, terms = terms[0], terms[1:]
+        repos = self._parse_repos(terms)
+        trace_file = self.get_option('trace_file')
+        self._tracer = tracer = Tracer(enabled=bool(trace_file))
 
-        url = f"https://api.github.com/repos/{user_or_org}/{repo}/releases/latest"
+        with tracer.phase('cache_lookup'):
+            cache = self._get_cache()
+            versions = {}
+            for repo in repos:
+                if repo not in versions:
+                    versions[repo] = self._get_cached_version(cache, self._cache_key(repo))
 
-        response = requests.get(url, headers=headers, timeout=5)
+        missing = [repo for repo, version in versions.items() if version is None]
+        tracer.count('repos', len(versions))
+        tracer.count('cache_hits', len(versions) - len(missing))
+        tracer.count('cache_misses', len(missing))
+        if missing:
+            workers = max(1, min(self.get_option('workers'), len(missing)))
+            with tracer.phase('fetch'), \
+                    GitHubClient(token=github_token,
+                                 max_workers=workers,
+                                 max_retries=self.get_option('max_retries'),
+                                 rate_limit_wait=self.get_option('rate_limit_wait'),
+                                 request_budget=self.get_option('request_budget'),
+                                 timeout=5,
+                                 api_url=self.get_option('api_url'),
+                                 tracer=tracer,
+                                 transport='auto') as client:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    fetched = executor.map(
+                        lambda repo: self._resolve_version(client, cache, repo), missing
+                    )
+                    try:
+                        for repo, version in zip(missing, fetched):
+                            versions[repo] = version
+                    except (GitHubError, LockTimeout) as e:
+                        raise AnsibleError(str(e)) from e
+            with tracer.phase('evict'):
+                self._evict(cache)
 
-        # Check for rate limiting before proceeding
-        if response.status_code == 403 and "rate limit exceeded" in response.text.lower():
-            raise AnsibleError("GitHub API rate limit exceeded.")
+        if trace_file:
+            try:
+                tracer.write(trace_file, plugin='jomrr.dev.github_version')
+            except OSError as e:
+                display.warning(f"Unable to write trace file {trace_file}: {e}")
 
-        if response.status_code == 404:
-            # Repository or releases not found, return '0.0.0'
-            return ['0.0.0']
+        return [versions[repo] for repo in repos]
 
-        if response.status_code != 200:
-            raise AnsibleError(
-                f"GitHub API responded with status code {response.status_code}: {response.text}"
-            )
+    @staticmethod
+    def _parse_repos(terms):
+        """Returns the (user_or_org, repo) pairs given in terms."""
+        # Legacy form: user_or_org and repo as two separate terms
+        if len(terms) == 2 and all(isinstance(t, str) and '/' not in t for t in terms):
+            return [tuple(terms)]
+
+        repos = []
+        for term in terms:
+            if isinstance(term, str) and term.count('/') == 1:
+                repos.append(tuple(term.split('/')))
+            elif isinstance(term, (list, tuple)) and len(term) == 2 and \
+                    all(isinstance(t, str) and '/' not in t for t in term):
+                repos.append(tuple(term))
+            elif isinstance(term, (list, tuple)):
+                repos.extend(LookupModule._parse_repos(list(term)))
+            else:
+                raise AnsibleError(
+                    f"github_version lookup expects owner/repo or [owner, repo], got {term!r}."
+                )
+        return repos
+
+    def _cache_key(self, repo):
+        """
+        Returns the cache key of a (user_or_org, repo) pair.
+
+        The key includes a digest of the API URL, so versions of repositories
+        with the same name on different GitHub instances are cached apart.
+        """
+        api_url = self.get_option('api_url').rstrip('/')
+        return "@".join(repo) + "@" + sha256(api_url.encode('utf-8')).hexdigest()[:12]
+
+    def _get_cache(self):
+        """Returns the cache plugin instance, or None if caching is disabled."""
+        if self.get_option('cache_timeout') <= 0:
+            return None
+
+        plugin_name = self.get_option('cache_plugin')
+        connection = self.get_option('cache_connection')
+        if (plugin_name, connection) not in _CACHES:
+            # Expiry is handled by this plugin, so the entries never expire in the backend
+            cache = cache_loader.get(plugin_name, _uri=connection, _timeout=0,
+                                     _prefix='github_version_')
+            if cache is None:
+                raise AnsibleError(f"Unable to load the cache plugin {plugin_name}.")
+            _CACHES[(plugin_name, connection)] = cache
+        return _CACHES[(plugin_name, connection)]
+
+    @staticmethod
+    def _lock_path(cache, key):
+        """Returns the path of the lock file of key, or None if the cache is not file based."""
+        cache_dir = getattr(cache, '_cache_dir', None)
+        if cache_dir is None:
+            return None
+        # Dot files are ignored by the file based cache plugins
+        return os.path.join(cache_dir, f".github_version_{key}.lock")
+
+    def _resolve_version(self, client, cache, repo):
+        """Fetches and caches the version of repo, once across concurrent processes."""
+        key = self._cache_key(repo)
+        lock_path = self._lock_path(cache, key)
+        if lock_path is None:
+            version = self._fetch_version(client, *repo)
+            self._set_cached_version(cache, key, version)
+            return version
+
+        with file_lock(lock_path, timeout=self.get_option('lock_timeout')):
+            # Another process may have fetched the version while this one waited,
+            # drop the copy the plugin keeps in memory to read it from disk
+            cache._cache.pop(key, None)
+            version = self._get_cached_version(cache, key)
+            if version is None:
+                version = self._fetch_version(client, *repo)
+                self._set_cached_version(cache, key, version)
+            else:
+                self._tracer.count('concurrent_cache_hits')
+        return version
+
+    def _get_cached_version(self, cache, key):
+        """Returns the cached version for key, or None if it is missing or expired."""
+        if cache is None:
+            return None
+        try:
+            entry = cache.get(key)
+        except KeyError:
+            return None
+        if not isinstance(entry, dict) or \
+                time.time() - entry.get('fetched', 0) > self.get_option('cache_timeout'):
+            return None
+        return entry.get('version')
+
+    def _set_cached_version(self, cache, key, version):
+        """Stores version for key together with the time it was fetched."""
+        if cache is not None:
+            cache.set(key, {'version': version, 'fetched': time.time()})
+
+    def _evict(self, cache):
+        """Evicts the oldest entries beyond cache_max_entries."""
+        if cache is None:
+            return
+
+        keys = list(cache.keys())
+        overflow = len(keys) - self.get_option('cache_max_entries')
+        if overflow > 0:
+            def fetched(cached_key):
+                try:
+                    return cache.get(cached_key).get('fetched', 0)
+                except (KeyError, AttributeError):
+                    return 0
+            for cached_key in sorted(keys, key=fetched)[:overflow]:
+                cache.delete(cached_key)
+
+    def _fetch_version(self, client, user_or_org, repo):
+        """Fetches the tag name of the latest release from the GitHub API."""
+        url = f"/repos/{user_or_org}/{repo}/releases/latest"
+
+        response = client.get(url, expected=(200, 404))
+        if response.status == 404:
+            # Repository or releases not found, return '0.0.0'
+            return '0.0.0'
 
         release_data = response.json()
-        return [release_data.get('tag_name', '0.0.0')]
+        return release_data.get('tag_name', '0.0.0')
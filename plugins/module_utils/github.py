@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared client for the GitHub REST and GraphQL APIs.
+
+The client paces requests by the rate limit headers of the responses, retries
+server errors and secondary rate limits with exponential backoff and jitter and
+enforces a request budget per run.
+
+Requests are sent with urllib of the standard library, so modules do not need
+any third party package on the target. On the controller a pooled requests
+session is used if requests is installed. The HTTP libraries are only imported
+when the first request is sent.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from importlib.util import find_spec
+from urllib.parse import urlencode
+
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import Tracer
+
+DEFAULT_API_URL = "https://api.github.com"
+
+# Status codes retried with backoff
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Below this number or fraction of the limit of remaining requests, whichever is lower,
+# requests are spread until the reset
+PACING_THRESHOLD = 50
+PACING_FRACTION = 0.1
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def github_client_argument_spec():
+    """Returns the argument spec of the options shared by modules using GitHubClient."""
+    return {
+        "max_retries": {"type": "int", "required": False, "default": 5},
+        "rate_limit_wait": {"type": "int", "required": False, "default": 60},
+        "request_budget": {"type": "int", "required": False, "default": 0},
+    }
+
+
+def build_query(user_or_org, is_org, search_query):
+    """Builds the repository search query string for the given user or organization."""
+    qualifiers = []
+    if search_query:
+        qualifiers.append(f"{search_query} in:name")
+    qualifiers.append(f"{'org' if is_org else 'user'}:{user_or_org}")
+    return ' '.join(qualifiers)
+
+
+class GitHubError(Exception):
+    """Raised when GitHub responds with an unexpected status."""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimitError(GitHubError):
+    """Raised when the rate limit is exhausted for longer than the client may wait."""
+
+
+class BudgetExhaustedError(GitHubError):
+    """Raised when the request budget of the client is used up."""
+
+
+class TransportError(Exception):
+    """Raised by a transport when a request failed without a response, e.g. on a timeout."""
+
+
+def parse_links(value):
+    """
+    Parses a Link header into a dict keyed by relation.
+
+    Returns:
+        A dict mapping each relation to a dict with its C(url) and C(rel).
+    """
+    links = {}
+    for link in re.split(r',\s*(?=<)', value or ''):
+        url, _, params = link.partition(';')
+        url = url.strip().lstrip('<').rstrip('>')
+        for param in params.split(';'):
+            key, _, rels = param.partition('=')
+            if key.strip().lower() == 'rel':
+                for rel in rels.strip().strip('"').split():
+                    links[rel] = {'url': url, 'rel': rel}
+    return links
+
+
+class GitHubResponse():
+    """
+    Response of a GitHub API request.
+
+    Attributes:
+        status: The HTTP status code.
+        headers: The response headers, case insensitive.
+        links: The parsed Link header, keyed by relation.
+        body: The raw response body.
+    """
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.links = parse_links(headers.get('Link'))
+        self.body = body
+
+    @property
+    def text(self):
+        """The decoded response body."""
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        """Returns the decoded JSON body."""
+        return json.loads(self.body)
+
+
+class UrllibTransport():
+    """
+    Sends requests with urllib of the standard library, one connection per request.
+
+    Proxies are taken from the environment and certificates are verified
+    against the default trust store.
+    """
+    def __init__(self, max_workers):
+        # pylint: disable=import-outside-toplevel
+        import http.client
+        import urllib.error
+        import urllib.request
+        self._errors = (OSError, http.client.HTTPException)
+        self._http_error = urllib.error.HTTPError
+        self._request = urllib.request.Request
+        self._opener = urllib.request.build_opener()
+
+    def send(self, method, url, headers, data, timeout):
+        """Sends a request and returns the status, headers and body of the response."""
+        request = self._request(url, data=data, headers=headers, method=method)
+        try:
+            with self._opener.open(request, timeout=timeout) as response:
+                return response.status, response.headers, response.read()
+        except self._http_error as e:
+            # Raised for every status outside of 2xx, it still carries the response
+            with e:
+                return e.code, e.headers, e.read()
+        except self._errors as e:
+            raise TransportError(str(e)) from e
+
+    def close(self):
+        """Nothing to close, connections are not kept."""
+
+
+class RequestsTransport():
+    """
+    Sends requests through a requests session, keeping a connection per worker alive.
+    """
+    def __init__(self, max_workers):
+        # pylint: disable=import-outside-toplevel
+        import requests
+        self._errors = (requests.ConnectionError, requests.Timeout)
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def send(self, method, url, headers, data, timeout):
+        """Sends a request and returns the status, headers and body of the response."""
+        try:
+            response = self._session.request(method, url, headers=headers, data=data,
+                                             timeout=timeout)
+        except self._errors as e:
+            raise TransportError(str(e)) from e
+        return response.status_code, response.headers, response.content
+
+    def close(self):
+        """Closes the connection pool."""
+        self._session.close()
+
+
+TRANSPORTS = {
+    'urllib': UrllibTransport,
+    'requests': RequestsTransport,
+}
+
+
+class RateLimiter():
+    """
+    Token bucket filled from the rate limit headers of GitHub.
+
+    The bucket of each rate limit resource (core, search, graphql) holds the
+    remaining requests and is refilled at the announced reset time. When few
+    requests remain relative to the limit of the resource, they are spread
+    evenly until the reset instead of being spent at once, waiting at most
+    max_wait seconds per request. Only an exhausted bucket whose reset is
+    further away than max_wait raises a RateLimitError.
+    """
+    def __init__(self, max_wait):
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._next_slot = {}
+
+    def acquire(self, resource):
+        """Blocks until a request against resource may be sent."""
+        with self._lock:
+            bucket = self._buckets.get(resource)
+            now = time.time()
+            if bucket is None or now >= bucket['reset']:
+                return
+
+            if bucket['remaining'] <= 0:
+                slot = bucket['reset'] + 1
+                if slot - now > self.max_wait:
+                    raise RateLimitError(
+                        f"GitHub API rate limit exceeded, resets in {int(bucket['reset'] - now)} "
+                        "seconds."
+                    )
+            elif bucket['remaining'] < self._pacing_threshold(bucket):
+                interval = (bucket['reset'] - now) / bucket['remaining']
+                slot = max(now, self._next_slot.get(resource, now) + interval)
+                slot = min(slot, now + self.max_wait)
+            else:
+                slot = now
+            bucket['remaining'] -= 1
+            self._next_slot[resource] = slot
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    @staticmethod
+    def _pacing_threshold(bucket):
+        """Returns the number of remaining requests below which requests are spread."""
+        if not bucket['limit']:
+            return PACING_THRESHOLD
+        return min(PACING_THRESHOLD, bucket['limit'] * PACING_FRACTION)
+
+    def update(self, resource, headers):
+        """Updates the bucket of resource from the rate limit headers of a response."""
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = int(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+        except (KeyError, TypeError, ValueError):
+            limit = None
+        resource = headers.get('X-RateLimit-Resource', resource)
+        with self._lock:
+            bucket = self._buckets.get(resource)
+            # Responses of concurrent requests arrive out of order, keep the lowest count
+            if bucket is None or reset > bucket['reset'] or \
+                    (reset == bucket['reset'] and remaining < bucket['remaining']):
+                self._buckets[resource] = {'remaining': remaining, 'reset': reset, 'limit': limit}
+
+
+class GitHubClient():
+    """
+    Client for the GitHub API shared by the modules and plugins of this collection.
+
+    Args:
+        token: GitHub personal access token, may be empty for anonymous requests.
+        max_workers: Number of threads sending requests through this client.
+        max_retries: Retries of a request on server errors and secondary rate limits.
+        rate_limit_wait: Maximum seconds to wait for the reset of an exhausted rate limit.
+        request_budget: Maximum number of requests sent by this client, 0 for no limit.
+        timeout: Timeout of a single request in seconds.
+        api_url: Base URL of the REST API, prepended to request paths starting with C(/).
+        tracer: Tracer recording the time spent in requests, rate limit waits and backoff
+            and the number of requests, retries and bytes read.
+        transport: C(urllib), C(requests) for a pooled session keeping connections alive,
+            or C(auto) for requests if it is installed and urllib otherwise.
+    """
+    def __init__(self, token='', max_workers=4, max_retries=5, rate_limit_wait=60,
+                 request_budget=0, timeout=10, api_url=DEFAULT_API_URL, tracer=None,
+                 transport='urllib'):
+        if transport == 'auto':
+            transport = 'requests' if find_spec('requests') is not None else 'urllib'
+        self.token = token
+        self.tracer = tracer or Tracer()
+        self.api_url = api_url.rstrip('/')
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.request_budget = request_budget
+        self.timeout = timeout
+        self.requests = 0
+        self.rate_limiter = RateLimiter(rate_limit_wait)
+        self._lock = threading.Lock()
+        self._transport_class = TRANSPORTS[transport]
+        self._transport = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connections of the transport."""
+        if self._transport is not None:
+            self._transport.close()
+
+    @property
+    def transport(self):
+        """The transport sending the requests, created with the first request."""
+        with self._lock:
+            if self._transport is None:
+                self._transport = self._transport_class(self.max_workers)
+            return self._transport
+
+    def _consume_budget(self):
+        with self._lock:
+            if self.request_budget and self.requests >= self.request_budget:
+                raise BudgetExhaustedError(
+                    f"Request budget of {self.request_budget} GitHub API requests exhausted."
+                )
+            self.requests += 1
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        """Returns the delay before retry number attempt, full jitter unless the server set one."""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def _retry_delay(self, response, attempt):
+        """Returns the delay before retrying response, or None if it is not retried."""
+        retry_after = response.headers.get('Retry-After')
+        retry_after = int(retry_after) if retry_after and retry_after.isdigit() else None
+        if retry_after is not None:
+            # Never sleep longer than an exhausted rate limit is waited for
+            retry_after = min(retry_after, self.rate_limiter.max_wait)
+
+        if response.status in (403, 429) and \
+                response.headers.get('X-RateLimit-Remaining') == '0':
+            # Primary rate limit, the next acquire waits for the reset or fails
+            return 0
+        if response.status == 403 and (
+                retry_after is not None or 'secondary rate limit' in response.text.lower()):
+            return self._backoff(attempt, retry_after)
+        if response.status in RETRY_STATUS:
+            return self._backoff(attempt, retry_after)
+        return None
+
+    def request(self, method, url, resource='core', expected=(200,), headers=None, params=None,
+                body=None):
+        """
+        Sends a request, pacing and retrying it as needed.
+
+        Args:
+            method: The HTTP method.
+            url: The URL of the API endpoint, or its path below the API URL.
+            resource: The rate limit resource of the endpoint, until known from the response.
+            expected: Status codes returned to the caller, others raise a GitHubError.
+            headers: Additional request headers.
+            params: Query parameters appended to the URL.
+            body: Object sent as JSON request body.
+
+        Returns:
+            A GitHubResponse.
+        """
+        request_headers = {"Accept": "application/vnd.github.v3+json"}
+        if self.token:
+            request_headers["Authorization"] = f"token {self.token}"
+        request_headers.update(headers or {})
+        if url.startswith('/'):
+            url = self.api_url + url
+        if params:
+            url += ('&' if '?' in url else '?') + urlencode(params)
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            request_headers["Content-Type"] = "application/json"
+
+        transport = self.transport
+        tracer = self.tracer
+        attempt = 0
+        while True:
+            with tracer.phase('rate_limit_wait'):
+                self.rate_limiter.acquire(resource)
+            self._consume_budget()
+            tracer.count('http_requests')
+            try:
+                with tracer.phase('http'):
+                    response = GitHubResponse(*transport.send(method, url, request_headers, data,
+                                                              self.timeout))
+            except TransportError as e:
+                if attempt >= self.max_retries:
+                    raise GitHubError(f"GitHub API request failed: {e}") from e
+                tracer.count('http_retries')
+                with tracer.phase('backoff'):
+                    time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if tracer.enabled:
+                tracer.count('http_bytes_read', len(response.body))
+                tracer.count(f"http_status_{response.status}")
+            self.rate_limiter.update(resource, response.headers)
+            if response.status in expected:
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt >= self.max_retries:
+                if response.status in (403, 429) and 'rate limit' in response.text.lower():
+                    raise RateLimitError("GitHub API rate limit exceeded.", response.status)
+                raise GitHubError(
+                    f"GitHub API responded with status code {response.status}: {response.text}",
+                    response.status
+                )
+            tracer.count('http_retries')
+            with tracer.phase('backoff'):
+                time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        """Sends a GET request."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Sends a POST request."""
+        return self.request('POST', url, **kwargs)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared YAML formatting of the to_lintable_yaml filter and the lintable_yaml module.
+"""
+
+import yaml
+from yaml.events import (DocumentEndEvent, DocumentStartEvent, MappingEndEvent,
+                         MappingStartEvent, ScalarEvent, SequenceEndEvent,
+                         SequenceStartEvent)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+
+class MyDumper(yaml.Dumper):
+    """
+    Custom YAML Dumper that increases indentation for nested collections.
+    """
+    def increase_indent(self, flow=False, indentless=False):
+        return super().increase_indent(flow, False)
+
+
+class _ChunkStream():
+    """
+    Stream collecting the chunks written by the emitter until they are taken.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def _scalar_event(dumper, node):
+    """
+    Returns the event of a scalar node, as the serializer of the dumper does.
+    """
+    detected_tag = dumper.resolve(ScalarNode, node.value, (True, False))
+    default_tag = dumper.resolve(ScalarNode, node.value, (False, True))
+    implicit = (node.tag == detected_tag), (node.tag == default_tag)
+    return ScalarEvent(None, node.tag, implicit, node.value, style=node.style)
+
+
+def _node_events(dumper, node):
+    """
+    Yields the events of a represented node.
+    """
+    if isinstance(node, ScalarNode):
+        yield _scalar_event(dumper, node)
+    elif isinstance(node, SequenceNode):
+        implicit = node.tag == dumper.resolve(SequenceNode, node.value, True)
+        yield SequenceStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        for item in node.value:
+            yield from _node_events(dumper, item)
+        yield SequenceEndEvent()
+    elif isinstance(node, MappingNode):
+        implicit = node.tag == dumper.resolve(MappingNode, node.value, True)
+        yield MappingStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        for key, value in node.value:
+            yield from _node_events(dumper, key)
+            yield from _node_events(dumper, value)
+        yield MappingEndEvent()
+
+
+def _data_events(dumper, data):
+    """
+    Yields the events of data without representing it as a whole.
+
+    Dictionaries and lists are walked directly, everything else is represented
+    by the dumper one value at a time. Shared objects are emitted as copies
+    instead of anchors and aliases.
+    """
+    if type(data) is dict:
+        items = list(data.items())
+        if dumper.sort_keys:
+            try:
+                items = sorted(items)
+            except TypeError:
+                pass
+        yield MappingStartEvent(None, 'tag:yaml.org,2002:map', True,
+                                flow_style=dumper.default_flow_style)
+        for key, value in items:
+            yield from _data_events(dumper, key)
+            yield from _data_events(dumper, value)
+        yield MappingEndEvent()
+    elif type(data) is list:
+        yield SequenceStartEvent(None, 'tag:yaml.org,2002:seq', True,
+                                 flow_style=dumper.default_flow_style)
+        for item in data:
+            yield from _data_events(dumper, item)
+        yield SequenceEndEvent()
+    else:
+        yield from _node_events(dumper, dumper.represent_data(data))
+
+
+def iter_lintable_yaml(documents, indent=2, sort_keys=False, explicit_start=False,
+                       dumper=MyDumper):
+    """
+    Emit documents as lintable YAML, yielding the output in chunks.
+
+    Only the events in the lookahead of the emitter and the chunks written since
+    the last yield are held in memory, not the represented documents or the output.
+
+    Args:
+        documents: An iterable of Python objects, each emitted as a YAML document.
+        indent: The number of spaces to use for indentation.
+        sort_keys: Whether to sort the keys of mappings.
+        explicit_start: Whether to start every document with C(---).
+        dumper: The Dumper class providing the formatting rules and representers.
+
+    Yields:
+        Strings, concatenated they are the YAML output.
+    """
+    stream = _ChunkStream()
+    yaml_dumper = dumper(stream, default_flow_style=False, indent=indent, sort_keys=sort_keys,
+                         explicit_start=explicit_start)
+    try:
+        yaml_dumper.open()
+        for document in documents:
+            yaml_dumper.emit(DocumentStartEvent(explicit=yaml_dumper.use_explicit_start,
+                                                version=yaml_dumper.use_version,
+                                                tags=yaml_dumper.use_tags))
+            for event in _data_events(yaml_dumper, document):
+                yaml_dumper.emit(event)
+                yield from stream.take()
+            yaml_dumper.emit(DocumentEndEvent(explicit=yaml_dumper.use_explicit_end))
+            yield from stream.take()
+        yaml_dumper.close()
+        yield from stream.take()
+    finally:
+        yaml_dumper.dispose()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Advisory file locks to let a single process refresh a shared cache entry.
+"""
+
+import errno
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+
+POLL_INTERVAL = 0.05
+
+
+class LockTimeout(Exception):
+    """Raised when a lock could not be acquired in time."""
+
+
+@contextmanager
+def file_lock(path, timeout=None):
+    """
+    Hold an exclusive fcntl lock on path while the context is active.
+
+    The lock file is created if needed and never removed, removing it would let
+    a process lock a file that another process already replaced. The lock is
+    released when the file is closed, also if the process dies.
+
+    Args:
+        path: Path of the lock file.
+        timeout: Maximum seconds to wait for the lock, None to wait indefinitely.
+
+    Raises:
+        LockTimeout: If the lock is held by another process for longer than timeout.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                    if time.monotonic() >= deadline:
+                        raise LockTimeout(
+                            f"Timed out after {timeout} seconds waiting for the lock {path}."
+                        ) from e
+                    time.sleep(POLL_INTERVAL)
+        yield
+    finally:
+        os.close(fd)
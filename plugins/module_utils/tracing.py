@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in instrumentation of the modules and plugins of this collection.
+
+A Tracer records the wall time of named phases and counters like HTTP requests,
+bytes read, cache hits and misses and parsed files. Modules return the trace,
+the inventory, lookup and filter plugins append it to a JSON lines trace file.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Enables the trace of the modules, e.g. through the environment keyword of a play
+TRACE_ENV = 'JOMRR_DEV_TRACE'
+
+# Trace file of the plugins, read directly by plugins without options like filters
+TRACE_FILE_ENV = 'JOMRR_DEV_TRACE_FILE'
+
+# Context of the phases of a disabled tracer, reusable as it does nothing
+_NO_PHASE = nullcontext()
+
+
+def trace_argument_spec():
+    """Returns the argument spec of the trace option of the modules."""
+    return {
+        "trace": {"type": "bool", "required": False, "default": False},
+    }
+
+
+def trace_enabled(option=False):
+    """Returns whether tracing is enabled by the module option or the JOMRR_DEV_TRACE variable."""
+    return bool(option) or os.environ.get(TRACE_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+class Tracer():
+    """
+    Records phase timings and counters, safe to share between threads.
+
+    A disabled tracer records nothing, so instrumented code only pays for
+    the check of the enabled flag.
+
+    Args:
+        enabled: Whether to record anything.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def phase(self, name):
+        """Adds the wall time of the context to the phase name, nested phases are included."""
+        if not self.enabled:
+            return _NO_PHASE
+        return self._timed_phase(name)
+
+    @contextmanager
+    def _timed_phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name, seconds, calls=1):
+        """Adds seconds spent in calls of the phase name."""
+        if not self.enabled:
+            return
+        with self._lock:
+            phase = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            phase['seconds'] += seconds
+            phase['calls'] += calls
+
+    def count(self, name, amount=1):
+        """Increments the counter name by amount."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, trace):
+        """Adds the phases and counters of a trace returned by another process."""
+        if not self.enabled or not trace:
+            return
+        for name, phase in trace.get('phases', {}).items():
+            self.add_phase(name, phase['seconds'], phase['calls'])
+        for name, amount in trace.get('counters', {}).items():
+            self.count(name, amount)
+
+    def as_dict(self):
+        """Returns the trace as a dict with the total, phase and counter values."""
+        with self._lock:
+            return {
+                'seconds': round(time.perf_counter() - self._start, 6),
+                'phases': {
+                    name: {'seconds': round(phase['seconds'], 6), 'calls': phase['calls']}
+                    for name, phase in sorted(self.phases.items())
+                },
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def write(self, path, **context):
+        """
+        Appends the trace as one JSON line to path, together with the context.
+
+        The line is written with a single append, so traces of concurrent
+        processes do not interleave.
+        """
+        if not self.enabled or not path:
+            return
+        record = {'timestamp': time.time(), 'pid': os.getpid()}
+        record.update(context)
+        record.update(self.as_dict())
+        line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
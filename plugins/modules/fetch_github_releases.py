@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module fetches the latest release of many GitHub repositories with
+the GraphQL API, resolving up to 100 repositories per request.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.jomrr.dev.plugins.module_utils.github import (
+    GitHubClient, GitHubError, build_query, github_client_argument_spec)
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import (
+    Tracer, trace_argument_spec, trace_enabled)
+
+DOCUMENTATION = '''
+---
+module: fetch_github_releases
+short_description: Fetches the latest release versions of GitHub repositories.
+version_added: "1.1"
+description:
+    - "This module fetches the tag name of the latest release of GitHub repositories with the GraphQL API."
+    - "Up to 100 repositories are resolved with a single request, either all repositories of a user or
+       organization matching a search query, or an explicit list of repositories."
+options:
+    github_token:
+        description:
+            - GitHub personal access token for authentication, the GraphQL API requires one.
+        required: true
+        type: str
+    user_or_org:
+        description:
+            - The user or organization name to search within.
+            - Mutually exclusive with I(repos).
+        required: false
+        type: str
+    is_org:
+        description:
+            - Flag to indicate if the search is for an organization.
+        required: false
+        default: false
+        type: bool
+    search_query:
+        description:
+            - The search query to filter repositories by name.
+        required: false
+        type: str
+    repos:
+        description:
+            - List of repositories given as C(owner/repo).
+            - Mutually exclusive with I(user_or_org).
+        required: false
+        type: list
+        elements: str
+    graphql_url:
+        description:
+            - URL of the GitHub GraphQL endpoint.
+        required: false
+        default: "https://api.github.com/graphql"
+        type: str
+    max_workers:
+        description:
+            - Maximum number of GraphQL requests sent concurrently when resolving I(repos).
+        required: false
+        default: 4
+        type: int
+extends_documentation_fragment:
+    - jomrr.dev.github
+    - jomrr.dev.trace
+author:
+    - Jonas Mauer (@jomrr)
+'''
+
+EXAMPLES = '''
+# Latest releases of all role repositories of an organization
+- name: Fetch latest releases of all roles
+  fetch_github_releases:
+    github_token: "{{ github_token }}"
+    user_or_org: "example_org"
+    is_org: true
+    search_query: "ansible-role-"
+  register: releases
+
+# Latest releases of selected repositories
+- name: Fetch latest releases of some roles
+  fetch_github_releases:
+    github_token: "{{ github_token }}"
+    repos:
+      - example_org/ansible-role-a
+      - example_org/ansible-role-b
+'''
+
+RETURN = '''
+changed:
+    description: Always false, the module only reads data.
+    type: bool
+    returned: always
+message:
+    description: Message about the action's result.
+    type: str
+    returned: always
+requests:
+    description: Number of requests sent to the GitHub API, retries included.
+    type: int
+    returned: success
+releases:
+    description:
+        - Mapping of C(owner/repo) to the tag name of its latest release.
+        - Repositories without releases or not found are mapped to C(0.0.0).
+    type: dict
+    returned: always
+trace:
+    description:
+        - Wall time in seconds and number of calls of the phase C(fetch) and of the GitHub API
+          requests (C(http)), the time of concurrent requests is summed up.
+        - Counters of HTTP requests, retries, status codes and bytes read and of the resolved
+          repositories.
+    type: dict
+    returned: when I(trace) is enabled
+'''
+
+PAGE_SIZE = 100
+
+SEARCH_QUERY = '''
+query($q: String!, $first: Int!, $after: String) {
+  search(query: $q, type: REPOSITORY, first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    nodes { ... on Repository { nameWithOwner latestRelease { tagName } } }
+  }
+}
+'''
+
+def build_repos_query(repos):
+    """
+    Builds a GraphQL query resolving the latest release of each repository.
+
+    Args:
+        repos: List of (owner, name) tuples.
+
+    Returns:
+        A tuple of the query string and its variables.
+    """
+    params = []
+    fields = []
+    variables = {}
+    for index, (owner, name) in enumerate(repos):
+        params.append(f"$o{index}: String!, $n{index}: String!")
+        fields.append(
+            f"r{index}: repository(owner: $o{index}, name: $n{index}) "
+            "{ nameWithOwner latestRelease { tagName } }"
+        )
+        variables[f"o{index}"] = owner
+        variables[f"n{index}"] = name
+    query = f"query({', '.join(params)}) {{\n  " + "\n  ".join(fields) + "\n}"
+    return query, variables
+
+def graphql(client, url, query, variables):
+    """Sends a GraphQL query and returns its data."""
+    response = client.post(url, resource='graphql',
+                           body={"query": query, "variables": variables})
+
+    result = response.json()
+    # Unknown repositories are reported as NOT_FOUND errors next to partial data
+    errors = [e for e in result.get('errors') or [] if e.get('type') != 'NOT_FOUND']
+    if errors:
+        raise GitHubError(f"GitHub GraphQL API error: {errors[0].get('message', errors[0])}")
+
+    return result.get('data') or {}
+
+def latest_tag(node):
+    """Returns the tag name of the latest release of a repository node."""
+    return ((node or {}).get('latestRelease') or {}).get('tagName') or '0.0.0'
+
+def fetch_search_releases(client, url, query):
+    """Fetches the latest releases of all repositories matching a search query."""
+    releases = {}
+    after = None
+    while True:
+        data = graphql(client, url, SEARCH_QUERY,
+                       {"q": query, "first": PAGE_SIZE, "after": after})
+        search = data.get('search') or {}
+        for node in search.get('nodes') or []:
+            if node and node.get('nameWithOwner'):
+                releases[node['nameWithOwner']] = latest_tag(node)
+        page_info = search.get('pageInfo') or {}
+        if not page_info.get('hasNextPage'):
+            return releases
+        after = page_info.get('endCursor')
+
+def fetch_repo_releases(client, url, repos, max_workers=4):
+    """Fetches the latest releases of the given repositories, 100 per request."""
+    pairs = [tuple(repo.split('/', 1)) for repo in repos]
+    chunks = [pairs[i:i + PAGE_SIZE] for i in range(0, len(pairs), PAGE_SIZE)]
+
+    def fetch_chunk(chunk):
+        query, variables = build_repos_query(chunk)
+        data = graphql(client, url, query, variables)
+        return {
+            f"{owner}/{name}": latest_tag(data.get(f"r{index}"))
+            for index, (owner, name) in enumerate(chunk)
+        }
+
+    releases = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_releases in executor.map(fetch_chunk, chunks):
+            releases.update(chunk_releases)
+    return releases
+
+def run_module():
+    """Contains the module's main logic."""
+    module = AnsibleModule(
+        argument_spec={
+            "github_token": {"type": "str", "required": True, "no_log": True},
+            "user_or_org": {"type": "str", "required": False},
+            "is_org": {"type": "bool", "required": False, "default": False},
+            "search_query": {"type": "str", "required": False, "default": None},
+            "repos": {"type": "list", "elements": "str", "required": False},
+            "graphql_url": {
+                "type": "str", "required": False, "default": "https://api.github.com/graphql"
+            },
+            "max_workers": {"type": "int", "required": False, "default": 4},
+            **github_client_argument_spec(),
+            **trace_argument_spec()
+        },
+        mutually_exclusive=[("user_or_org", "repos")],
+        required_one_of=[("user_or_org", "repos")],
+        supports_check_mode=True
+    )
+
+    invalid = [repo for repo in module.params['repos'] or [] if repo.count('/') != 1]
+    if invalid:
+        module.fail_json(msg=f"Repositories must be given as owner/repo: {', '.join(invalid)}")
+
+    tracer = Tracer(enabled=trace_enabled(module.params['trace']))
+    try:
+        with tracer.phase('fetch'), \
+                GitHubClient(token=module.params['github_token'],
+                             max_workers=module.params['max_workers'],
+                             max_retries=module.params['max_retries'],
+                             rate_limit_wait=module.params['rate_limit_wait'],
+                             request_budget=module.params['request_budget'],
+                             timeout=30,
+                             tracer=tracer) as client:
+            if module.params['repos']:
+                releases = fetch_repo_releases(
+                    client,
+                    module.params['graphql_url'],
+                    module.params['repos'],
+                    max_workers=module.params['max_workers']
+                )
+            else:
+                releases = fetch_search_releases(
+                    client,
+                    module.params['graphql_url'],
+                    build_query(
+                        module.params['user_or_org'],
+                        module.params['is_org'],
+                        module.params['search_query']
+                    )
+                )
+
+        result = {
+            'changed': False,
+            'message': f"Fetched latest releases of {len(releases)} repositories.",
+            'releases': releases,
+            'requests': client.requests,
+        }
+        if tracer.enabled:
+            tracer.count('repos', len(releases))
+            result['trace'] = tracer.as_dict()
+        module.exit_json(**result)
+    except Exception as e:
+        module.fail_json(msg=str(e))
+
+def main():
+    """Runs the module."""
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,20 @@ This module fetches GitHub repositories based on a search query and
 caches the response locally as a JSON file.
 """
 
+import gzip
 import json
 import os
+import tempfile
 import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.jomrr.dev.plugins.module_utils.github import (
+    DEFAULT_API_URL, GitHubClient, build_query, github_client_argument_spec)
+from ansible_collections.jomrr.dev.plugins.module_utils.locking import file_lock
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import (
+    Tracer, trace_argument_spec, trace_enabled)
 
 DOCUMENTATION = '''
 ---
@@ -19,6 +28,16 @@ version_added: "1.0"
 description:
     - "This module fetches GitHub repositories based on a search query and caches the response locally as a JSON file.
     - It is designed to reduce API calls by updating the cache based on a specified update threshold."
+    - "The ETag and Last-Modified headers of the response are stored next to the cache file (C(cache_file).meta).
+       Once the update threshold has passed, the cache is revalidated with conditional requests and only
+       refetched if GitHub reports a change."
+    - "The cache file is replaced atomically, so concurrent readers never see a partially written file.
+       Gzip compressed cache files are detected when they are read."
+    - "Concurrent runs sharing a cache file, e.g. forks with C(strategy=free), refresh it only once.
+       The refresh holds a lock on C(cache_file).lock, the other runs wait for it and reuse the result."
+    - "With I(sync_mode=incremental) only repositories pushed since the last sync are fetched and
+       merged into the cache by their id. A full sync every I(reconcile_interval) seconds removes
+       deleted repositories."
 options:
     github_token:
         description:
@@ -48,12 +67,75 @@ options:
         required: false
         default: "/tmp/ansible/github_repos.json"
         type: str
+    cache_fields:
+        description:
+            - Fields of each repository kept in the cache file and in I(gh_repos).
+            - Nested fields are given as dotted paths, e.g. C(owner.login).
+            - All fields returned by GitHub are kept if not set.
+            - Changing the fields refetches the repository data.
+        required: false
+        type: list
+        elements: str
+    compact:
+        description:
+            - Write the cache file without indentation and whitespace.
+        required: false
+        default: false
+        type: bool
+    compress:
+        description:
+            - Compress the cache file with gzip.
+        required: false
+        default: false
+        type: bool
+    sync_mode:
+        description:
+            - C(full) fetches all repositories matching the query on every refresh.
+            - C(incremental) fetches only repositories pushed since the last sync, sorted by their
+              last update, and merges them into the cached data by id.
+            - If I(cache_fields) is set, C(id) is always kept in incremental mode.
+        required: false
+        default: full
+        choices: [full, incremental]
+        type: str
+    reconcile_interval:
+        description:
+            - Seconds after which an incremental sync fetches all repositories again, to remove
+              repositories that were deleted or no longer match the query.
+        required: false
+        default: 86400
+        type: int
+    lock_timeout:
+        description:
+            - Maximum number of seconds to wait for a concurrent run refreshing the cache file.
+        required: false
+        default: 300
+        type: int
     update_threshold_seconds:
         description:
             - The threshold in seconds to determine when to update the cache.
+            - After the threshold the cache is revalidated, which does not count against the
+              rate limit when the data did not change.
         required: false
         default: 3600
         type: int
+    api_url:
+        description:
+            - Base URL of the GitHub REST API, e.g. of a GitHub Enterprise Server.
+        required: false
+        default: "https://api.github.com"
+        type: str
+    max_workers:
+        description:
+            - Maximum number of result pages fetched concurrently.
+            - Results are requested with 100 repositories per page, the GitHub search API
+              returns at most 1000 results for a single query.
+        required: false
+        default: 4
+        type: int
+extends_documentation_fragment:
+    - jomrr.dev.github
+    - jomrr.dev.trace
 author:
     - Your Name (@yourgithub)
 '''
@@ -67,48 +149,353 @@ EXAMPLES = '''
     is_org: false
     search_query: "ansible-role-"
     cache_file: "/path/to/cache_file.json"
+
+# Example to keep a small, compressed cache shared by many hosts
+- name: Fetch and cache the names and URLs of GitHub repositories
+  fetch_github_repos:
+    user_or_org: "example_org"
+    is_org: true
+    search_query: "ansible-role-"
+    cache_file: "/path/to/cache_file.json.gz"
+    cache_fields:
+      - name
+      - full_name
+      - clone_url
+      - owner.login
+    compact: true
+    compress: true
+
+# Example to only fetch repositories pushed since the last sync
+- name: Sync GitHub repositories incrementally
+  fetch_github_repos:
+    user_or_org: "example_org"
+    is_org: true
+    search_query: "ansible-role-"
+    sync_mode: incremental
+    update_threshold_seconds: 600
+  register: repos
+
+- name: Act on the changed repositories only
+  ansible.builtin.debug:
+    msg: "{{ repos.delta.added + repos.delta.updated }}"
 '''
 
 RETURN = '''
 changed:
     description: Indicates whether any changes were made by the module.
+        False if the cache was revalidated and GitHub reported no change.
     type: bool
     returned: always
 message:
     description: Message about the action's result.
     type: str
     returned: always
+delta:
+    description:
+        - Repositories added, updated and removed by this run, given by C(full_name),
+          or by C(name) or C(id) if the full name is not cached.
+        - Removed repositories are only detected by full syncs.
+    type: dict
+    returned: success
+    contains:
+        added:
+            description: Repositories not in the cache before.
+            type: list
+            elements: str
+        updated:
+            description: Repositories whose cached data changed.
+            type: list
+            elements: str
+        removed:
+            description: Repositories no longer returned by GitHub.
+            type: list
+            elements: str
+requests:
+    description: Number of requests sent to the GitHub API, retries included.
+    type: int
+    returned: success
+trace:
+    description:
+        - Wall time in seconds and number of calls of the phases C(cache_check), C(lock),
+          C(revalidate), C(fetch), C(save) and C(load) and of the GitHub API requests (C(http)).
+          Phases run while the cache file is locked are included in C(lock), the time of
+          concurrent requests is summed up.
+        - Counters of cache hits and misses, HTTP requests, retries and status codes and of
+          bytes read and written.
+    type: dict
+    returned: when I(trace) is enabled
+    sample:
+        seconds: 1.52
+        phases:
+            fetch: {seconds: 1.31, calls: 1}
+            http: {seconds: 2.47, calls: 10}
+        counters:
+            cache_misses: 1
+            http_requests: 10
+            http_bytes_read: 1843210
 gh_repos:
-    description: Fetched GitHub repositories data.
+    description:
+        - Fetched GitHub repositories data, with the items of all result pages merged.
+        - The items only contain the fields given in I(cache_fields), if set.
     type: dict
     returned: always
 '''
 
-def fetch_repos(github_token, user_or_org, is_org, search_query):
-    """Fetches repositories from GitHub based on a search query."""
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
+SEARCH_PATH = "/search/repositories"
+PER_PAGE = 100
+
+# Incremental syncs start this many seconds before the last sync, to tolerate clock skew
+SYNC_OVERLAP = 300
+
+def fetch_page(client, query, page, headers=None, sort=None):
+    """Fetches a single page of search results from GitHub."""
+    params = {"q": query, "per_page": PER_PAGE, "page": page}
+    if sort:
+        params["sort"] = sort
+    return client.get(
+        SEARCH_PATH,
+        resource='search',
+        expected=(200, 304),
+        headers=headers,
+        params=params
+    )
+
+def last_page(response):
+    """Returns the number of the last result page announced in the Link header."""
+    last_url = response.links.get('last', {}).get('url')
+    if not last_url:
+        return 1
+    return int(parse_qs(urlparse(last_url).query).get('page', ['1'])[0])
+
+def page_validator(response):
+    """Returns the ETag and Last-Modified validators of a response."""
+    return {
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified')
     }
-    url = f"https://api.github.com/search/repositories?q={
-        search_query + '+in:name+' if search_query else '' }{
-            'org:' if is_org else 'user:'}{user_or_org}"
-    response = requests.get(url, headers=headers, timeout=10)
 
-    # Handle rate limit exceeded error
-    if response.status_code == 403 and "rate limit exceeded" in response.text.lower():
-        raise Exception("GitHub API rate limit exceeded.")
+def fetch_repos(client, user_or_org, is_org, search_query, max_workers=4, since=None):
+    """
+    Fetches all repositories from GitHub based on a search query.
+
+    The first page is fetched to learn the number of pages from the Link header,
+    the remaining pages are then fetched concurrently and merged in page order.
+
+    Args:
+        since: Only fetch repositories pushed at or after this Unix time, sorted by update.
 
-    if response.status_code != 200:
-        raise Exception(f"GitHub API responded with status code {
-            response.status_code}: {response.text}")
+    Returns:
+        A tuple of the merged search result and the list of per page validators.
+    """
+    query = build_query(user_or_org, is_org, search_query)
+    sort = None
+    if since is not None:
+        query += f" pushed:>={time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(since))}"
+        sort = 'updated'
 
-    return response.json()
+    first = fetch_page(client, query, 1, sort=sort)
+    data = first.json()
+    validators = [page_validator(first)]
+
+    pages = range(2, last_page(first) + 1)
+    if pages:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            responses = executor.map(lambda page: fetch_page(client, query, page, sort=sort), pages)
+            for response in responses:
+                page_data = response.json()
+                data['items'].extend(page_data.get('items', []))
+                data['incomplete_results'] = (
+                    data.get('incomplete_results', False)
+                    or page_data.get('incomplete_results', False)
+                )
+                validators.append(page_validator(response))
+
+    return data, validators
+
+def is_modified(client, query, validators, max_workers=4):
+    """
+    Revalidates the cached result pages with conditional requests.
+
+    Every page is requested with If-None-Match / If-Modified-Since. Replies
+    with status 304 do not count against the rate limit of the GitHub API.
+
+    Returns:
+        False if every page was answered with 304 Not Modified, True otherwise.
+    """
+    if not validators or not all(v.get('etag') or v.get('last_modified') for v in validators):
+        return True
 
-def save_repos_to_file(data, file_path):
-    """Saves the fetched repository data to a local JSON file."""
-    with open(file_path, 'w', encoding="utf-8") as file:
-        json.dump(data, file, indent=4)
+    def revalidate(page, validator):
+        headers = {}
+        if validator.get('etag'):
+            headers['If-None-Match'] = validator['etag']
+        if validator.get('last_modified'):
+            headers['If-Modified-Since'] = validator['last_modified']
+        return fetch_page(client, query, page, headers).status != 304
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(revalidate, range(1, len(validators) + 1), validators)
+        return any(list(results))
+
+def select_fields(item, fields):
+    """
+    Returns a copy of a repository item with only the given fields.
+
+    Args:
+        item: The repository item returned by GitHub.
+        fields: List of field names, nested fields given as dotted paths.
+
+    Returns:
+        A dictionary with the selected fields, missing fields are skipped.
+    """
+    selected = {}
+    for field in fields:
+        source = item
+        target = selected
+        keys = field.split('.')
+        for key in keys[:-1]:
+            source = source.get(key) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(key, {})
+        else:
+            if isinstance(source, dict) and keys[-1] in source:
+                target[keys[-1]] = source[keys[-1]]
+    return selected
+
+def trim_repos(data, fields):
+    """Reduces the repository items of a search result to the given fields."""
+    if not fields:
+        return data
+    data['items'] = [select_fields(item, fields) for item in data.get('items', [])]
+    return data
+
+def repo_key(item):
+    """Returns the key identifying a repository item, its id if it is cached."""
+    return item.get('id', item.get('full_name', item.get('name')))
+
+def repo_label(item):
+    """Returns the name of a repository item reported in the delta."""
+    return str(item.get('full_name', item.get('name', item.get('id'))))
+
+def diff_repos(previous, items, complete=True):
+    """
+    Compares repository items with the previously cached items.
+
+    Args:
+        previous: The previously cached items.
+        items: The fetched items.
+        complete: Whether items are all repositories, so missing ones were removed.
+
+    Returns:
+        A dictionary with the added, updated and removed repositories.
+    """
+    cached = {repo_key(item): item for item in previous}
+    delta = {'added': [], 'updated': [], 'removed': []}
+    for item in items:
+        key = repo_key(item)
+        if key not in cached:
+            delta['added'].append(repo_label(item))
+        elif cached[key] != item:
+            delta['updated'].append(repo_label(item))
+    if complete:
+        fetched = {repo_key(item) for item in items}
+        delta['removed'] = [repo_label(item) for key, item in cached.items() if key not in fetched]
+    return delta
+
+def merge_repos(data, items):
+    """
+    Merges fetched repository items into cached search result data by their key.
+
+    Updated items replace the cached ones in place, new items are appended.
+    """
+    positions = {repo_key(item): index for index, item in enumerate(data['items'])}
+    for item in items:
+        key = repo_key(item)
+        if key in positions:
+            data['items'][positions[key]] = item
+        else:
+            positions[key] = len(data['items'])
+            data['items'].append(item)
+    data['total_count'] = len(data['items'])
+    return data
+
+def write_file_atomic(file_path, content):
+    """
+    Writes content to a temporary file next to file_path and renames it over file_path.
+
+    Readers either see the previous or the new content, never a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        # mkstemp creates the file readable by the owner only
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_repos_to_file(data, file_path, compact=False, compress=False, tracer=None):
+    """Saves the fetched repository data to a local JSON file, optionally gzip compressed."""
+    if compact:
+        content = json.dumps(data, separators=(',', ':'))
+    else:
+        content = json.dumps(data, indent=4)
+    content = content.encode('utf-8')
+    if compress:
+        content = gzip.compress(content, mtime=0)
+    if tracer is not None:
+        tracer.count('bytes_written', len(content))
+    write_file_atomic(file_path, content)
+
+def load_repos_from_file(file_path, tracer=None):
+    """Loads the cached repository data, gzip compressed files are detected by their magic number."""
+    with open(file_path, 'rb') as file:
+        content = file.read()
+    if tracer is not None:
+        tracer.count('bytes_read', len(content))
+        tracer.count('files_parsed')
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    return json.loads(content)
+
+def meta_file_path(file_path):
+    """Returns the path of the file holding the validators of a cache file."""
+    return f"{file_path}.meta"
+
+def load_cache_meta(file_path):
+    """Loads the query and validators stored next to a cache file."""
+    meta_path = meta_file_path(file_path)
+    if not os.path.exists(file_path) or not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def save_cache_meta(query, validators, file_path, fields=None, synced_at=None, reconciled_at=None):
+    """
+    Saves the query, fields and validators of the cached response next to the cache file.
+
+    Args:
+        synced_at: Unix time the last sync started.
+        reconciled_at: Unix time the last full sync started.
+    """
+    meta = {"query": query, "fields": fields, "validators": validators,
+            "synced_at": synced_at, "reconciled_at": reconciled_at}
+    write_file_atomic(meta_file_path(file_path), json.dumps(meta, indent=4).encode('utf-8'))
+
+def lock_file_path(file_path):
+    """Returns the path of the file locked while a cache file is refreshed."""
+    return f"{file_path}.lock"
 
 def is_update_needed(file_path, update_threshold_seconds):
     """Checks if the cache file needs to be updated."""
@@ -118,6 +505,121 @@ def is_update_needed(file_path, update_threshold_seconds):
     current_time = time.time()
     return (current_time - last_mod_time) > update_threshold_seconds
 
+def cache_state(file_path, fields, update_threshold_seconds):
+    """
+    Loads the cache meta and checks if the cache file needs to be refreshed.
+
+    Returns:
+        A tuple of the cache meta, whether the cached fields differ from fields
+        and whether the cache needs to be refreshed.
+    """
+    meta = load_cache_meta(file_path)
+    # Cached data with other fields is refetched right away
+    fields_changed = meta is not None and meta.get('fields') != fields
+    return meta, fields_changed, \
+        fields_changed or is_update_needed(file_path, update_threshold_seconds)
+
+def cache_fields(module):
+    """Returns the fields to cache, the id is needed to merge incremental syncs."""
+    fields = module.params['cache_fields'] or None
+    if fields and module.params['sync_mode'] == 'incremental' and 'id' not in fields:
+        fields = ['id'] + fields
+    return fields
+
+def load_previous_repos(cache_file, meta, query, fields_changed, tracer=None):
+    """Returns the cached data if it belongs to query and the cached fields, else None."""
+    if not meta or meta.get('query') != query or fields_changed:
+        return None
+    try:
+        return load_repos_from_file(cache_file, tracer)
+    except (OSError, ValueError):
+        return None
+
+def refresh_cache(module, client, query, meta, fields_changed):
+    """
+    Revalidates, incrementally syncs or refetches the cached repository data.
+
+    Returns:
+        A tuple of the repository data, the result message, whether the data
+        changed and the delta.
+    """
+    cache_file = module.params['cache_file']
+    fields = cache_fields(module)
+    no_delta = {'added': [], 'updated': [], 'removed': []}
+    started = time.time()
+    tracer = client.tracer
+
+    with tracer.phase('load'):
+        previous = load_previous_repos(cache_file, meta, query, fields_changed, tracer)
+    if module.params['sync_mode'] == 'incremental' and previous is not None and \
+            meta.get('synced_at') and \
+            started - (meta.get('reconciled_at') or 0) < module.params['reconcile_interval']:
+        with tracer.phase('fetch'):
+            repos, _ = fetch_repos(
+                client=client,
+                user_or_org=module.params['user_or_org'],
+                is_org=module.params['is_org'],
+                search_query=module.params['search_query'],
+                max_workers=module.params['max_workers'],
+                since=meta['synced_at'] - SYNC_OVERLAP
+            )
+        # More changes than a search returns are synced in full
+        if len(repos.get('items', [])) >= repos.get('total_count', 0):
+            items = trim_repos(repos, fields)['items']
+            delta = diff_repos(previous.get('items', []), items, complete=False)
+            changed = bool(delta['added'] or delta['updated'])
+            with tracer.phase('save'):
+                if changed:
+                    previous = merge_repos(previous, items)
+                    save_repos_to_file(previous, cache_file,
+                                       compact=module.params['compact'],
+                                       compress=module.params['compress'],
+                                       tracer=tracer)
+                else:
+                    # Nothing changed since the last sync, only refresh the cache timestamp
+                    os.utime(cache_file)
+                save_cache_meta(query, meta.get('validators'), cache_file, fields,
+                                synced_at=started, reconciled_at=meta.get('reconciled_at'))
+            return previous, (
+                f"Repository data synchronized incrementally, {len(delta['added'])} added, "
+                f"{len(delta['updated'])} updated."
+            ), changed, delta
+    elif module.params['sync_mode'] == 'full' and previous is not None:
+        with tracer.phase('revalidate'):
+            modified = is_modified(
+                client=client,
+                query=query,
+                validators=meta.get('validators'),
+                max_workers=module.params['max_workers']
+            )
+        if not modified:
+            # Upstream data is unchanged, only refresh the cache timestamp
+            os.utime(cache_file)
+            return previous, 'Cache file revalidated, repository data not modified.', False, \
+                no_delta
+
+    with tracer.phase('fetch'):
+        repos, validators = fetch_repos(
+            client=client,
+            user_or_org=module.params['user_or_org'],
+            is_org=module.params['is_org'],
+            search_query=module.params['search_query'],
+            max_workers=module.params['max_workers']
+        )
+
+    gh_repos = trim_repos(repos, fields)
+    delta = no_delta
+    if previous is not None:
+        delta = diff_repos(previous.get('items', []), gh_repos.get('items', []))
+    with tracer.phase('save'):
+        save_repos_to_file(gh_repos, cache_file,
+                           compact=module.params['compact'],
+                           compress=module.params['compress'],
+                           tracer=tracer)
+        save_cache_meta(query, validators, cache_file, fields,
+                        synced_at=started, reconciled_at=started)
+    return gh_repos, 'Repository data fetched and cached successfully.', True, delta
+
 def run_module():
     """Contains the module's main logic."""
     module = AnsibleModule(
@@ -129,33 +631,78 @@ def run_module():
             "cache_file": {
                 "type": "str", "required": False, "default": "/tmp/ansible/github_repos.json"
             },
-            "update_threshold_seconds": {"type": "int", "default": 3600}
+            "cache_fields": {"type": "list", "elements": "str", "required": False},
+            "compact": {"type": "bool", "required": False, "default": False},
+            "compress": {"type": "bool", "required": False, "default": False},
+            "sync_mode": {
+                "type": "str", "required": False, "default": "full",
+                "choices": ["full", "incremental"]
+            },
+            "reconcile_interval": {"type": "int", "required": False, "default": 86400},
+            "lock_timeout": {"type": "int", "required": False, "default": 300},
+            "update_threshold_seconds": {"type": "int", "default": 3600},
+            "api_url": {"type": "str", "required": False, "default": DEFAULT_API_URL},
+            "max_workers": {"type": "int", "required": False, "default": 4},
+            **github_client_argument_spec(),
+            **trace_argument_spec()
         },
         supports_check_mode=False
     )
 
-    try:
-        if is_update_needed(module.params['cache_file'], module.params['update_threshold_seconds']):
-            repos = fetch_repos(
-                github_token=module.params['github_token'],
-                user_or_org=module.params['user_or_org'],
-                is_org=module.params['is_org'],
-                search_query=module.params['search_query']
-            )
+    cache_file = module.params['cache_file']
+    fields = cache_fields(module)
+    query = build_query(
+        module.params['user_or_org'], module.params['is_org'], module.params['search_query']
+    )
 
-            save_repos_to_file(repos, module.params['cache_file'])
-            message = 'Repository data fetched and cached successfully.'
-            changed = True
+    tracer = Tracer(enabled=trace_enabled(module.params['trace']))
+    client = GitHubClient(
+        token=module.params['github_token'],
+        max_workers=module.params['max_workers'],
+        max_retries=module.params['max_retries'],
+        rate_limit_wait=module.params['rate_limit_wait'],
+        request_budget=module.params['request_budget'],
+        api_url=module.params['api_url'],
+        tracer=tracer
+    )
+    try:
+        gh_repos = None
+        delta = {'added': [], 'updated': [], 'removed': []}
+        threshold = module.params['update_threshold_seconds']
+        with tracer.phase('cache_check'):
+            meta, fields_changed, update_needed = cache_state(cache_file, fields, threshold)
+        if update_needed:
+            # Only one run refreshes the cache, concurrent runs wait and reuse its result
+            with tracer.phase('lock'), \
+                    file_lock(lock_file_path(cache_file), timeout=module.params['lock_timeout']):
+                meta, fields_changed, update_needed = cache_state(cache_file, fields, threshold)
+                if update_needed:
+                    tracer.count('cache_misses')
+                    gh_repos, message, changed, delta = refresh_cache(
+                        module, client, query, meta, fields_changed
+                    )
+                else:
+                    tracer.count('cache_hits')
+                    message = 'Cache file was updated by a concurrent run.'
+                    changed = False
         else:
+            tracer.count('cache_hits')
             message = 'Cache file is up to date, no update needed.'
             changed = False
 
-        with open(module.params['cache_file'], 'r', encoding="utf-8") as file:
-            gh_repos = json.load(file)
+        if gh_repos is None:
+            with tracer.phase('load'):
+                gh_repos = load_repos_from_file(cache_file, tracer)
 
-        module.exit_json(changed=changed, message=message, gh_repos=gh_repos)
+        result = {'changed': changed, 'message': message, 'gh_repos': gh_repos, 'delta': delta,
+                  'requests': client.requests}
+        if tracer.enabled:
+            result['trace'] = tracer.as_dict()
+        module.exit_json(**result)
     except Exception as e:
         module.fail_json(msg=str(e))
+    finally:
+        client.close()
 
 def main():
     """Runs the module."""
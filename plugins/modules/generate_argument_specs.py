@@ -5,9 +5,15 @@ Ansible Module for generating meta/argument_specs.yml from a provided
 default variable file, e.g. defaults/main.yml.
 """
 
+import copy
 import os
-import yaml
+import re
+from functools import lru_cache, partial
+from hashlib import sha256
+
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import (
+    Tracer, trace_argument_spec, trace_enabled)
 
 DOCUMENTATION = '''
 ---
@@ -16,17 +22,68 @@ short_description: Generates argument specifications from default role variables
 version_added: "1.0"
 description:
     - "This module reads variables from a specified defaults/main.yml file within an Ansible role and generates a meta/argument_specs.yml file with argument specifications for those variables, including type inference."
+    - "With I(roles_path) or I(role_paths) the specs of many roles are generated in one invocation,
+       using a pool of worker processes."
+    - "The first lines of the generated file record the generator version and the digests of the
+       defaults file and of the generated specs. If neither changed, the files are not parsed at all."
+    - "With I(deep_inference) nested lists and dictionaries are described with C(elements) and
+       C(options), the element types of lists are unified across all list members."
 options:
     defaults_file:
         description:
             - The path to the role's defaults/main.yml file from which to read variables.
-        required: true
+            - Required together with I(output_file) unless I(roles_path) or I(role_paths) is given.
+        required: false
         type: str
     output_file:
         description:
             - The path to the meta/argument_specs.yml file to generate or update.
-        required: true
+        required: false
         type: str
+    roles_path:
+        description:
+            - Directory containing roles, every sub directory with a defaults/main.yml file is processed.
+            - The specs are written to meta/argument_specs.yml of each role.
+        required: false
+        type: path
+    role_paths:
+        description:
+            - List of role directories to process.
+            - The specs are written to meta/argument_specs.yml of each role.
+        required: false
+        type: list
+        elements: path
+    workers:
+        description:
+            - Number of worker processes used with I(roles_path) or I(role_paths).
+            - Defaults to the number of CPUs.
+        required: false
+        type: int
+    deep_inference:
+        description:
+            - Infer C(elements) of lists and C(options) of dictionaries recursively.
+            - Strings starting with C(/), C(~/), C(./) or C(../) are typed as C(path).
+            - Note that Ansible rejects keys not listed in C(options) when validating a dictionary,
+              so only enable this for dictionaries with a fixed set of keys.
+        required: false
+        type: bool
+        default: false
+    incremental:
+        description:
+            - Update existing argument specs instead of regenerating them.
+            - Only added and removed variables and variables whose default or type changed are
+              applied, other fields like hand written descriptions, choices or required are kept.
+            - A type is only replaced if the existing type cannot hold the new default,
+              e.g. C(path) is kept for a string default.
+            - With I(deep_inference) the C(elements) and C(options) are updated recursively
+              the same way, options no longer in the default are removed.
+            - The file is only rewritten if the defaults changed since it was last written and
+              the update results in a delta.
+        required: false
+        type: bool
+        default: false
+extends_documentation_fragment:
+    - jomrr.dev.trace
 author:
     - Your Name (@yourgithub)
 '''
@@ -37,6 +94,19 @@ EXAMPLES = '''
   generate_argument_specs:
     defaults_file: "{{ role_path }}/defaults/main.yml"
     output_file: "{{ role_path }}/meta/argument_specs.yml"
+
+# Example of updating existing argument specs while keeping hand written fields
+- name: Update argument specs from role defaults
+  generate_argument_specs:
+    defaults_file: "{{ role_path }}/defaults/main.yml"
+    output_file: "{{ role_path }}/meta/argument_specs.yml"
+    incremental: true
+
+# Example of generating the argument specs of all roles in a directory
+- name: Generate argument specs for all roles
+  generate_argument_specs:
+    roles_path: "~/src/ansible/roles"
+    workers: 8
 '''
 
 RETURN = '''
@@ -48,8 +118,82 @@ changed:
     description: Indicates whether any changes were made by the module.
     type: bool
     returned: always
+delta:
+    description: The variables added, removed and changed by an incremental update.
+    type: dict
+    returned: when incremental is true and the specs were compared
+    contains:
+        added:
+            description: Variables added to the specs.
+            type: list
+            elements: str
+        removed:
+            description: Variables removed from the specs.
+            type: list
+            elements: str
+        changed:
+            description: Variables whose default, type, elements or options were updated.
+            type: list
+            elements: str
+roles:
+    description: The per role results with I(roles_path) or I(role_paths).
+    type: list
+    elements: dict
+    returned: when roles_path or role_paths is given
+    contains:
+        role_path:
+            description: The role directory.
+            type: str
+        changed:
+            description: Whether the role's argument specs were updated.
+            type: bool
+        failed:
+            description: Whether generating the role's argument specs failed.
+            type: bool
+        message:
+            description: A message about the result for the role.
+            type: str
+        delta:
+            description: The delta of an incremental update, see I(delta).
+            type: dict
+trace:
+    description:
+        - Wall time in seconds and number of calls of the phases C(read), C(parse), C(generate),
+          C(merge) and C(save), summed up over all roles and worker processes.
+        - Counters of bytes read, parsed files, written files and of roles skipped because their
+          specs are up to date (C(cache_hits)) or not (C(cache_misses)).
+    type: dict
+    returned: when I(trace) is enabled
 '''
 
+# Bump when the generated specs change for the same defaults
+GENERATOR_VERSION = 2
+
+# Existing types kept by incremental updates for a default of the inferred type
+COMPATIBLE_TYPES = {
+    'str': ('str', 'path', 'raw'),
+    'path': ('path', 'str', 'raw'),
+    'int': ('int', 'float', 'raw'),
+    'float': ('float', 'raw'),
+    'bool': ('bool', 'raw'),
+    'list': ('list', 'raw'),
+    'dict': ('dict', 'raw'),
+    'raw': ('raw',),
+}
+
+PATH_PREFIXES = ('/', '~/', './', '../')
+
+MARKER_PREFIX = '# generated by jomrr.dev.generate_argument_specs'
+# One digest per line, so the marker stays within the line length limit of yamllint
+MARKER_RE = re.compile(
+    re.escape(MARKER_PREFIX) + r' v(?P<version>[\w+]+)\n'
+    r'# defaults: (?P<defaults>[0-9a-f]+)\n'
+    r'# specs: (?P<specs>[0-9a-f]+)\n'
+)
+
+class ArgumentSpecsError(Exception):
+    """Raised when the argument specs of a role cannot be generated."""
+
 def infer_type(value):
     """
     Infer the type of a variable for documentation purposes.
@@ -58,138 +202,640 @@ def infer_type(value):
         value: The value of the variable.
 
     Returns:
-        A string representing the inferred type ('str', 'int', 'bool', 'list', 'dict').
+        A string representing the inferred type ('str', 'int', 'float', 'bool', 'list',
+        'dict' or 'raw' for None).
     """
     if isinstance(value, bool):
         return 'bool'
     elif isinstance(value, int):
         return 'int'
+    elif isinstance(value, float):
+        return 'float'
     elif isinstance(value, list):
         return 'list'
     elif isinstance(value, dict):
         return 'dict'
+    elif value is None:
+        return 'raw'
     else:
         return 'str'
 
-def load_defaults(file_path, module):
+def value_shape(value):
+    """
+    Describe the structure of a value as a hashable shape.
+
+    Scalars are described by their type, lists by the set of their element
+    shapes and dictionaries by their keys and value shapes. Similar list
+    members therefore collapse into a single element shape.
+
+    Args:
+        value: The value to describe.
+
+    Returns:
+        A type name for scalars, ('list', frozenset) for lists and
+        ('dict', tuple of (key, shape) pairs) for dictionaries.
+    """
+    if isinstance(value, list):
+        return ('list', frozenset(value_shape(item) for item in value))
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            return 'dict'
+        return ('dict', tuple(sorted((key, value_shape(item)) for key, item in value.items())))
+    if isinstance(value, str) and value.startswith(PATH_PREFIXES):
+        return 'path'
+    return infer_type(value)
+
+def shape_type(shape):
+    """
+    Return the type name of a shape.
+    """
+    return shape if isinstance(shape, str) else shape[0]
+
+@lru_cache(maxsize=None)
+def unify_shapes(shapes):
+    """
+    Unify the shapes of list members into one element shape.
+
+    Dictionaries are merged key by key, lists by their element shapes,
+    int and float unify to float and path and str to str. Anything else
+    unifies to raw.
+
+    Args:
+        shapes: A frozenset of shapes.
+
+    Returns:
+        The unified shape.
+    """
+    if len(shapes) == 1:
+        return next(iter(shapes))
+
+    types = {shape_type(shape) for shape in shapes}
+    if types == {'dict'}:
+        if any(isinstance(shape, str) for shape in shapes):
+            return 'dict'
+        keys = {}
+        for shape in shapes:
+            for key, key_shape in shape[1]:
+                keys.setdefault(key, set()).add(key_shape)
+        return ('dict', tuple(sorted(
+            (key, unify_shapes(frozenset(key_shapes))) for key, key_shapes in keys.items()
+        )))
+    if types == {'list'}:
+        return ('list', frozenset().union(*(shape[1] for shape in shapes)))
+    if types <= {'int', 'float'}:
+        return 'float'
+    if types <= {'str', 'path'}:
+        return 'str'
+    return 'raw'
+
+@lru_cache(maxsize=None)
+def spec_for_shape(shape):
+    """
+    Build the type, elements and options fields of an argument spec for a shape.
+
+    Memoized on the shape, so repetitive structures are only described once.
+    The result is shared and must not be modified.
+
+    Args:
+        shape: A shape as returned by value_shape.
+
+    Returns:
+        A dictionary with the type and, for lists and dictionaries, the
+        elements and options fields.
+    """
+    spec = {'type': shape_type(shape)}
+    if isinstance(shape, str):
+        return spec
+
+    kind, content = shape
+    if kind == 'list' and content:
+        element = spec_for_shape(unify_shapes(content))
+        spec['elements'] = element['type']
+        if 'options' in element:
+            spec['options'] = element['options']
+    elif kind == 'dict' and content:
+        spec['options'] = {key: spec_for_shape(key_shape) for key, key_shape in content}
+    return spec
+
+def infer_spec(value):
     """
-    Load variables from a YAML file.
+    Infer the type, elements and options of a variable recursively.
 
     Args:
-        file_path: Path to the YAML file.
-        module: An instance of AnsibleModule for error handling.
+        value: The value of the variable.
 
     Returns:
-        A dictionary of variables loaded from the file.
-        Returns an empty dictionary if the file does not exist or is empty.
+        A dictionary with the type and, for lists and dictionaries, the
+        elements and options fields.
+    """
+    # Copied so the dumper does not emit anchors for memoized specs used twice
+    return copy.deepcopy(spec_for_shape(value_shape(value)))
+
+def generator_tag(deep_inference):
+    """
+    Return the generator tag recorded in the marker of generated files.
+    """
+    return f"{GENERATOR_VERSION}+deep" if deep_inference else str(GENERATOR_VERSION)
+
+def read_file(file_path):
+    """
+    Read the content of a file.
+
+    Args:
+        file_path: Path to the file.
+
+    Returns:
+        The content of the file as bytes, or None if the file does not exist.
+
+    Raises:
+        ArgumentSpecsError: If the file cannot be read.
     """
-    if not os.path.exists(file_path):
-        return {}  # Return an empty dictionary for consistency
     try:
-        with open(file_path, 'r', encoding="utf-8") as file:
-            return yaml.safe_load(file) or {}
+        with open(file_path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
     except OSError as e:
-        module.fail_json(msg=f"Failed to open YAML file {file_path}: {e}")
+        raise ArgumentSpecsError(f"Failed to open file {file_path}: {e}") from e
+
+@lru_cache(maxsize=None)
+def import_yaml():
+    """
+    Import PyYAML on first use, roles with up to date specs are skipped without it.
+
+    Returns:
+        A tuple of the yaml module and the safe loader and dumper, libyaml based if available.
+    """
+    # pylint: disable=import-outside-toplevel
+    import yaml
+    try:
+        from yaml import CSafeDumper as SafeDumper
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeDumper, SafeLoader
+    return yaml, SafeLoader, SafeDumper
+
+def load_yaml(data, file_path):
+    """
+    Parse YAML content, with the libyaml based loader if available.
+
+    Args:
+        data: The YAML content.
+        file_path: Path of the file the content was read from, for error messages.
+
+    Returns:
+        The parsed content.
+
+    Raises:
+        ArgumentSpecsError: If the content cannot be parsed.
+    """
+    yaml, SafeLoader, _ = import_yaml()
+    try:
+        return yaml.load(data, Loader=SafeLoader)
     except yaml.YAMLError as e:
-        module.fail_json(msg=f"Failed to parse YAML file {file_path}: {e}")
+        raise ArgumentSpecsError(f"Failed to parse YAML file {file_path}: {e}") from e
+
+def digest(data):
+    """
+    Return the hex encoded SHA-256 digest of data.
+    """
+    return sha256(data).hexdigest()
+
+def is_up_to_date(existing_data, defaults_digest, check_body=True, deep_inference=False):
+    """
+    Check the marker of a generated file against the digest of the defaults.
+
+    Args:
+        existing_data: Content of the existing argument specs file.
+        defaults_digest: Digest of the defaults file.
+        check_body: Whether modifications of the file since it was written count as outdated.
+        deep_inference: Whether the specs are generated with deep type inference.
+
+    Returns:
+        True if the file was generated by this generator version from the
+        same defaults and, with check_body, was not modified since.
+    """
+    marker = MARKER_RE.match(existing_data.decode('utf-8', errors='replace'))
+    if not marker:
+        return False
+    body = existing_data[marker.end():]
+    return (marker.group('version') == generator_tag(deep_inference)
+            and marker.group('defaults') == defaults_digest
+            and (not check_body or marker.group('specs') == digest(body)))
 
-def generate_argument_specs(variables):
+def generate_argument_specs(variables, deep_inference=False):
     """
     Generate argument specifications based on variables.
 
     Args:
         variables: Dictionary of variables to generate specs for.
+        deep_inference: Whether to infer elements and options recursively.
 
     Returns:
         A dictionary representing the argument specifications.
     """
     argument_specs = {'role_parameters': {}}
     for var_name, default_value in variables.items():
-        var_type = infer_type(default_value)
-        argument_specs['role_parameters'][var_name] = {
+        spec = {
             'description': [f'The {var_name} parameter.'],
             'default': default_value,
-            'type': var_type
         }
+        if deep_inference:
+            spec.update(infer_spec(default_value))
+        else:
+            spec['type'] = infer_type(default_value)
+        argument_specs['role_parameters'][var_name] = spec
     return argument_specs
 
-def read_existing_content(file_path, module):
+def merge_structure(entry, spec):
     """
-    Read the existing content of a YAML file and fail gracefully on error.
+    Apply the generated type, elements and options to an existing spec recursively.
+
+    Hand written fields like the description are kept for the options that are
+    still inferred. An inferred type of raw says nothing about the value, so the
+    existing type is kept and the elements and options are left as they are.
 
     Args:
-        file_path: Path to the YAML file.
-        module: The Ansible module object for error handling.
+        entry: The existing spec, modified in place.
+        spec: The generated spec.
 
     Returns:
-        The content of the file if it exists and is valid YAML, otherwise None.
+        True if the existing spec was modified.
     """
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return yaml.safe_load(file)
-        except OSError as e:
-            module.fail_json(msg=f"Unable to open file {file_path}: {e}")
-        except yaml.YAMLError as e:
-            module.fail_json(msg=f"Error parsing YAML content in file {file_path}: {e}")
-    return None
+    if spec['type'] == 'raw' and 'type' in entry:
+        return False
 
-def save_argument_specs(specs, file_path, module):
+    updated = False
+    if entry.get('type') not in COMPATIBLE_TYPES.get(spec['type'], (spec['type'],)):
+        entry['type'] = spec['type']
+        # The structure changed, so existing elements and options are outdated
+        entry.pop('elements', None)
+        entry.pop('options', None)
+        updated = True
+    if 'elements' in spec and \
+            entry.get('elements') not in COMPATIBLE_TYPES.get(spec['elements'], (spec['elements'],)):
+        if 'elements' in entry:
+            # The options described the previous elements
+            entry.pop('options', None)
+        entry['elements'] = spec['elements']
+        updated = True
+    if 'options' in spec:
+        current = entry.get('options') if isinstance(entry.get('options'), dict) else {}
+        options = {}
+        for key, option_spec in spec['options'].items():
+            if isinstance(current.get(key), dict):
+                options[key] = dict(current[key])
+                updated = merge_structure(options[key], option_spec) or updated
+            else:
+                options[key] = option_spec
+                updated = True
+        if any(key not in options for key in current):
+            updated = True
+        entry['options'] = options
+    return updated
+
+def merge_argument_specs(specs, existing):
+    """
+    Apply generated argument specs to existing ones, keeping hand written fields.
+
+    Args:
+        specs: The generated argument specs.
+        existing: The existing argument specs.
+
+    Returns:
+        A tuple of the merged argument specs and a delta dictionary
+        listing the added, removed and changed variables.
+    """
+    existing = existing if isinstance(existing, dict) else {}
+    current = existing.get('role_parameters') or {}
+    merged = dict(existing)
+    merged['role_parameters'] = {}
+    delta = {'added': [], 'removed': [], 'changed': []}
+
+    for var_name, spec in specs['role_parameters'].items():
+        if not isinstance(current.get(var_name), dict):
+            merged['role_parameters'][var_name] = spec
+            delta['added'].append(var_name)
+            continue
+
+        entry = dict(current[var_name])
+        updated = False
+        if entry.get('default') != spec['default']:
+            entry['default'] = spec['default']
+            updated = True
+        if merge_structure(entry, spec):
+            updated = True
+        if updated:
+            delta['changed'].append(var_name)
+        merged['role_parameters'][var_name] = entry
+
+    delta['removed'] = [var_name for var_name in current if var_name not in specs['role_parameters']]
+    return merged, delta
+
+def save_argument_specs(specs, file_path, defaults_digest, existing_data=None,
+                        deep_inference=False):
     """
     Save argument specs to a YAML file, only if changed.
 
     Args:
         specs: The argument specs to save.
         file_path: Path to the YAML file to save specs to.
-        module: The Ansible module object for error handling.
+        defaults_digest: Digest of the defaults file, recorded in the marker.
+        existing_data: Current content of the file, or None if it does not exist.
+        deep_inference: Whether the specs were generated with deep type inference.
 
     Returns:
         changed: Boolean indicating if the file was updated.
+
+    Raises:
+        ArgumentSpecsError: If the file cannot be written.
     """
-    existing_content = read_existing_content(file_path, module)
-    if specs != existing_content:
-        try:
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'w', encoding="utf-8") as file:
-                yaml.safe_dump(specs, file, default_flow_style=False)
-            return True
-        except OSError as e:
-            module.fail_json(msg=f"Failed to create directories or open the file {file_path}: {e}")
-        except yaml.YAMLError as e:
-            module.fail_json(msg=f"Failed to dump YAML content to {file_path}: {e}")
+    yaml, _, SafeDumper = import_yaml()
+    try:
+        body = yaml.dump(specs, Dumper=SafeDumper, default_flow_style=False).encode('utf-8')
+    except yaml.YAMLError as e:
+        raise ArgumentSpecsError(f"Failed to dump YAML content to {file_path}: {e}") from e
+    return write_specs(file_path, body, defaults_digest, existing_data, deep_inference)
+
+def update_marker(file_path, existing_data, defaults_digest, deep_inference=False):
+    """
+    Record the digest of the defaults in the marker of an existing file, keeping its specs.
+
+    Args:
+        file_path: Path to the argument specs file.
+        existing_data: Current content of the file.
+        defaults_digest: Digest of the defaults file.
+        deep_inference: Whether the specs were generated with deep type inference.
+
+    Returns:
+        changed: Boolean indicating if the file was updated.
+
+    Raises:
+        ArgumentSpecsError: If the file cannot be written.
+    """
+    marker = MARKER_RE.match(existing_data.decode('utf-8', errors='replace'))
+    body = existing_data[marker.end():] if marker else existing_data
+    return write_specs(file_path, body, defaults_digest, existing_data, deep_inference)
+
+def write_specs(file_path, body, defaults_digest, existing_data=None, deep_inference=False):
+    """
+    Write the marker and the specs body to a file, only if changed.
+
+    Args:
+        file_path: Path to the argument specs file.
+        body: The dumped argument specs.
+        defaults_digest: Digest of the defaults file, recorded in the marker.
+        existing_data: Current content of the file, or None if it does not exist.
+        deep_inference: Whether the specs were generated with deep type inference.
+
+    Returns:
+        changed: Boolean indicating if the file was updated.
+
+    Raises:
+        ArgumentSpecsError: If the file cannot be written.
+    """
+    content = (
+        f"{MARKER_PREFIX} v{generator_tag(deep_inference)}\n"
+        f"# defaults: {defaults_digest}\n"
+        f"# specs: {digest(body)}\n"
+    ).encode('utf-8') + body
+    if content == existing_data:
         return False
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return True
+    except OSError as e:
+        raise ArgumentSpecsError(
+            f"Failed to create directories or open the file {file_path}: {e}"
+        ) from e
+
+def process_role(defaults_file, output_file, incremental=False, deep_inference=False,
+                 tracer=None):
+    """
+    Generate the argument specs of a single role.
+
+    Nothing is parsed if the marker of the output file shows that it was
+    generated from the current defaults and was not modified since. In
+    incremental mode modifications since are expected and ignored.
+
+    Args:
+        defaults_file: Path to the role's defaults/main.yml file.
+        output_file: Path to the role's meta/argument_specs.yml file.
+        incremental: Whether to merge the generated specs into the existing ones.
+        deep_inference: Whether to infer elements and options recursively.
+        tracer: Tracer recording the phases, bytes read and parsed and written files.
+
+    Returns:
+        A tuple of a boolean indicating if the output file was updated, a message
+        and the delta of an incremental update or None.
+
+    Raises:
+        ArgumentSpecsError: If reading the defaults or writing the specs fails.
+    """
+    no_variables = "No variables found or defaults/main.yml does not exist."
+    unchanged = "No changes detected in argument specs."
+    tracer = tracer or Tracer()
+
+    with tracer.phase('read'):
+        defaults_data = read_file(defaults_file)
+        existing_data = read_file(output_file) if defaults_data is not None else None
+    if defaults_data is None:
+        return False, no_variables, None
+    tracer.count('bytes_read', len(defaults_data) + len(existing_data or b''))
+    defaults_digest = digest(defaults_data)
+
+    if existing_data is not None and \
+            is_up_to_date(existing_data, defaults_digest, check_body=not incremental,
+                          deep_inference=deep_inference):
+        tracer.count('cache_hits')
+        return False, unchanged, None
+    tracer.count('cache_misses')
+
+    with tracer.phase('parse'):
+        variables = load_yaml(defaults_data, defaults_file)
+    tracer.count('files_parsed')
+    if not variables:
+        return False, no_variables, None
+    if not isinstance(variables, dict):
+        raise ArgumentSpecsError(f"Defaults file {defaults_file} does not contain a mapping of "
+                                 "variables.")
+
+    with tracer.phase('generate'):
+        argument_specs = generate_argument_specs(variables, deep_inference)
+    delta = None
+    if incremental and existing_data is not None:
+        with tracer.phase('merge'):
+            argument_specs, delta = merge_argument_specs(
+                argument_specs, load_yaml(existing_data, output_file)
+            )
+        tracer.count('files_parsed')
+        if not any(delta.values()):
+            # Only the marker is updated, so the next run skips parsing the files again
+            with tracer.phase('save'):
+                changed = update_marker(output_file, existing_data, defaults_digest,
+                                        deep_inference)
+            tracer.count('files_written', int(changed))
+            return changed, (f"Defaults digest recorded in {output_file}, argument specs "
+                             "unchanged." if changed else unchanged), delta
+
+    with tracer.phase('save'):
+        changed = save_argument_specs(argument_specs, output_file, defaults_digest, existing_data,
+                                      deep_inference)
+    tracer.count('files_written', int(changed))
+    return changed, (f"Argument specs have been successfully generated in {output_file}." if changed
+                     else unchanged), delta
+
+def process_role_path(role_path, incremental=False, deep_inference=False, trace=False):
+    """
+    Generate the argument specs of the role in role_path, used by the worker processes.
+
+    Args:
+        role_path: Path to the role directory.
+        incremental: Whether to merge the generated specs into the existing ones.
+        deep_inference: Whether to infer elements and options recursively.
+        trace: Whether to add the trace of the role to the result, for the parent to merge.
+
+    Returns:
+        A dictionary with the result for the role.
+    """
+    tracer = Tracer(enabled=trace)
+    try:
+        changed, message, delta = process_role(
+            os.path.join(role_path, 'defaults', 'main.yml'),
+            os.path.join(role_path, 'meta', 'argument_specs.yml'),
+            incremental=incremental,
+            deep_inference=deep_inference,
+            tracer=tracer
+        )
+        result = {'role_path': role_path, 'changed': changed, 'failed': False, 'message': message}
+        if delta is not None:
+            result['delta'] = delta
+    except ArgumentSpecsError as e:
+        result = {'role_path': role_path, 'changed': False, 'failed': True, 'message': str(e)}
+    if trace:
+        result['trace'] = tracer.as_dict()
+    return result
+
+def find_roles(roles_path):
+    """
+    Find the role directories containing a defaults/main.yml file.
+
+    Args:
+        roles_path: Directory containing roles.
+
+    Returns:
+        A sorted list of role directories.
+    """
+    with os.scandir(roles_path) as entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.is_dir() and os.path.isfile(os.path.join(entry.path, 'defaults', 'main.yml'))
+        )
+
+def process_roles(role_paths, workers=None, incremental=False, deep_inference=False,
+                  tracer=None):
+    """
+    Generate the argument specs of many roles in a pool of worker processes.
+
+    Args:
+        role_paths: List of role directories.
+        workers: Number of worker processes, defaults to the number of CPUs.
+        incremental: Whether to merge the generated specs into the existing ones.
+        deep_inference: Whether to infer elements and options recursively.
+        tracer: Tracer the traces of the roles are merged into.
+
+    Returns:
+        A list with the result of each role, in the order of role_paths.
+    """
+    tracer = tracer or Tracer()
+    process = partial(process_role_path, incremental=incremental, deep_inference=deep_inference,
+                      trace=tracer.enabled)
+    workers = min(workers or os.cpu_count() or 1, len(role_paths))
+    if workers <= 1:
+        results = [process(role_path) for role_path in role_paths]
+    else:
+        # Only imported for a pool, a single role is processed in this process
+        # pylint: disable=import-outside-toplevel
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Workers are forked so they inherit the module code loaded by AnsiballZ
+        try:
+            mp_context = multiprocessing.get_context('fork')
+        except ValueError:
+            mp_context = None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            results = list(executor.map(process, role_paths,
+                                        chunksize=max(1, len(role_paths) // (workers * 4))))
+    for result in results:
+        tracer.merge(result.pop('trace', None))
+    return results
 
 def run_module():
     """
     Execute module logic.
     """
     module_args = dict(
-        defaults_file=dict(type='str', required=True),
-        output_file=dict(type='str', required=True)
+        defaults_file=dict(type='str', required=False),
+        output_file=dict(type='str', required=False),
+        roles_path=dict(type='path', required=False),
+        role_paths=dict(type='list', elements='path', required=False),
+        workers=dict(type='int', required=False),
+        incremental=dict(type='bool', required=False, default=False),
+        deep_inference=dict(type='bool', required=False, default=False),
+        **trace_argument_spec()
     )
 
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[('defaults_file', 'roles_path', 'role_paths')],
+        required_one_of=[('defaults_file', 'roles_path', 'role_paths')],
+        required_together=[('defaults_file', 'output_file')],
         supports_check_mode=True
     )
 
     if module.check_mode:
         module.exit_json(changed=False)
 
-    defaults_file = module.params['defaults_file']
-    output_file = module.params['output_file']
+    tracer = Tracer(enabled=trace_enabled(module.params['trace']))
+    if module.params['defaults_file']:
+        try:
+            changed, message, delta = process_role(module.params['defaults_file'],
+                                                   module.params['output_file'],
+                                                   incremental=module.params['incremental'],
+                                                   deep_inference=module.params['deep_inference'],
+                                                   tracer=tracer)
+        except ArgumentSpecsError as e:
+            module.fail_json(msg=str(e))
+        result = {'changed': changed, 'message': message}
+        if delta is not None:
+            result['delta'] = delta
+        if tracer.enabled:
+            result['trace'] = tracer.as_dict()
+        module.exit_json(**result)
 
-    variables = load_defaults(defaults_file, module)
-    if variables is None or not variables:
-        module.exit_json(changed=False,
-                         msg="No variables found or defaults/main.yml does not exist.")
+    if module.params['roles_path']:
+        if not os.path.isdir(module.params['roles_path']):
+            module.fail_json(msg=f"Roles path {module.params['roles_path']} is not a directory.")
+        role_paths = find_roles(module.params['roles_path'])
+    else:
+        role_paths = module.params['role_paths']
 
-    argument_specs = generate_argument_specs(variables)
-    changed = save_argument_specs(argument_specs, output_file, module)
+    results = process_roles(role_paths, module.params['workers'], module.params['incremental'],
+                            module.params['deep_inference'], tracer=tracer)
+    changed = any(result['changed'] for result in results)
+    trace = {'trace': tracer.as_dict()} if tracer.enabled else {}
+    failed = [result['role_path'] for result in results if result['failed']]
+    if failed:
+        module.fail_json(msg=f"Failed to generate argument specs for: {', '.join(failed)}",
+                         changed=changed, roles=results, **trace)
 
     module.exit_json(changed=changed,
-                     message="Argument specs have been successfully generated." if changed
-                     else "No changes detected in argument specs.")
+                     message=f"Processed {len(results)} roles, "
+                     f"{sum(result['changed'] for result in results)} changed.",
+                     roles=results, **trace)
 
 if __name__ == '__main__':
     run_module()
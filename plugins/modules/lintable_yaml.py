@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module writes data as lintable YAML to a file, streaming the output
+instead of building it in memory.
+"""
+
+import os
+import tempfile
+from hashlib import sha256
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.jomrr.dev.plugins.module_utils.lintable_yaml import iter_lintable_yaml
+from ansible_collections.jomrr.dev.plugins.module_utils.tracing import (
+    Tracer, trace_argument_spec, trace_enabled)
+
+DOCUMENTATION = '''
+---
+module: lintable_yaml
+short_description: Writes data as lintable YAML to a file.
+version_added: "1.1"
+description:
+    - "This module writes data to a file with the formatting of the C(jomrr.dev.to_lintable_yaml)
+       filter, sequences in mappings are indented."
+    - "The output is streamed to a temporary file in the destination directory, which replaces the
+       destination only if its content changed. Neither the YAML output nor a representation of the
+       whole data is held in memory, so large structures can be written with bounded memory."
+    - "Lists can be written as one YAML document per item."
+requirements:
+    - PyYAML
+options:
+    dest:
+        description:
+            - Path of the file to write.
+        required: true
+        type: path
+    content:
+        description:
+            - The data to write.
+        required: true
+        type: raw
+    multi_document:
+        description:
+            - Write each item of a list in I(content) as a separate YAML document.
+        required: false
+        default: false
+        type: bool
+    explicit_start:
+        description:
+            - Start every document with C(---).
+        required: false
+        default: false
+        type: bool
+    indent:
+        description:
+            - The number of spaces to use for indentation.
+        required: false
+        default: 2
+        type: int
+    sort_keys:
+        description:
+            - Sort the keys of mappings.
+        required: false
+        default: false
+        type: bool
+extends_documentation_fragment:
+    - ansible.builtin.files
+    - jomrr.dev.trace
+author:
+    - Jonas Mauer (@jomrr)
+'''
+
+EXAMPLES = '''
+- name: Write the package manifest
+  lintable_yaml:
+    dest: /srv/manifest.yml
+    content: "{{ packages }}"
+    explicit_start: true
+
+- name: Write one document per package
+  lintable_yaml:
+    dest: /srv/packages.yml
+    content: "{{ packages }}"
+    multi_document: true
+    sort_keys: true
+'''
+
+RETURN = '''
+changed:
+    description: Whether the content of the file changed.
+    type: bool
+    returned: always
+dest:
+    description: Path of the written file.
+    type: str
+    returned: always
+documents:
+    description: Number of written YAML documents.
+    type: int
+    returned: always
+sha256:
+    description: SHA256 checksum of the written content.
+    type: str
+    returned: always
+trace:
+    description:
+        - Wall time in seconds and number of calls of the phases C(digest) of the existing file,
+          C(write) of the new content and C(move) to the destination.
+        - Counters of bytes read and written.
+    type: dict
+    returned: when I(trace) is enabled
+'''
+
+# Number of bytes collected from the emitter before they are written
+BUFFER_SIZE = 64 * 1024
+
+def file_digest(file_path, tracer=None):
+    """
+    Compute the SHA256 digest of a file, None if it does not exist.
+    """
+    digest = sha256()
+    size = 0
+    try:
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(BUFFER_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+    except FileNotFoundError:
+        return None
+    if tracer is not None:
+        tracer.count('bytes_read', size)
+    return digest.hexdigest()
+
+def write_documents(documents, file, indent, sort_keys, explicit_start, tracer=None):
+    """
+    Stream documents as lintable YAML to a binary file.
+
+    Args:
+        documents: An iterable of the documents to write.
+        file: A binary file object, or None to only compute the digest.
+        indent: The number of spaces to use for indentation.
+        sort_keys: Whether to sort the keys of mappings.
+        explicit_start: Whether to start every document with C(---).
+        tracer: Tracer counting the written bytes.
+
+    Returns:
+        The SHA256 digest of the written content.
+    """
+    digest = sha256()
+    buffer = []
+    size = 0
+    written = 0
+    for chunk in iter_lintable_yaml(documents, indent=indent, sort_keys=sort_keys,
+                                    explicit_start=explicit_start):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= BUFFER_SIZE:
+            data = ''.join(buffer).encode('utf-8')
+            digest.update(data)
+            if file is not None:
+                file.write(data)
+            written += len(data)
+            buffer = []
+            size = 0
+    data = ''.join(buffer).encode('utf-8')
+    digest.update(data)
+    if file is not None:
+        file.write(data)
+    written += len(data)
+    if tracer is not None:
+        tracer.count('bytes_written', written)
+    return digest.hexdigest()
+
+def run_module():
+    """Contains the module's main logic."""
+    module = AnsibleModule(
+        argument_spec={
+            "dest": {"type": "path", "required": True},
+            "content": {"type": "raw", "required": True},
+            "multi_document": {"type": "bool", "required": False, "default": False},
+            "explicit_start": {"type": "bool", "required": False, "default": False},
+            "indent": {"type": "int", "required": False, "default": 2},
+            "sort_keys": {"type": "bool", "required": False, "default": False},
+            **trace_argument_spec()
+        },
+        add_file_common_args=True,
+        supports_check_mode=True
+    )
+
+    dest = module.params['dest']
+    content = module.params['content']
+    if module.params['multi_document']:
+        if not isinstance(content, list):
+            module.fail_json(msg="content must be a list when multi_document is enabled.")
+        documents = content
+    else:
+        documents = [content]
+    options = {
+        'indent': module.params['indent'],
+        'sort_keys': module.params['sort_keys'],
+        'explicit_start': module.params['explicit_start'],
+    }
+
+    dest_dir = os.path.dirname(os.path.abspath(dest))
+    if not os.path.isdir(dest_dir):
+        module.fail_json(msg=f"Destination directory {dest_dir} does not exist.")
+
+    tracer = Tracer(enabled=trace_enabled(module.params['trace']))
+    options['tracer'] = tracer
+    with tracer.phase('digest'):
+        existing_digest = file_digest(dest, tracer)
+    tmp_path = None
+    try:
+        if module.check_mode:
+            with tracer.phase('write'):
+                digest = write_documents(documents, None, **options)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=f".{os.path.basename(dest)}.")
+            with tracer.phase('write'), os.fdopen(fd, 'wb') as file:
+                digest = write_documents(documents, file, **options)
+            if digest != existing_digest:
+                with tracer.phase('move'):
+                    module.atomic_move(tmp_path, dest)
+                tmp_path = None
+    except Exception as e:
+        module.fail_json(msg=f"Failed to write {dest}: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    changed = digest != existing_digest
+    if os.path.exists(dest):
+        file_args = module.load_file_common_arguments(module.params)
+        changed = module.set_fs_attributes_if_different(file_args, changed)
+
+    result = {'changed': changed, 'dest': dest, 'documents': len(documents), 'sha256': digest}
+    if tracer.enabled:
+        result['trace'] = tracer.as_dict()
+    module.exit_json(**result)
+
+def main():
+    """Runs the module."""
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local stand-in for the parts of the GitHub REST API used by this collection.
+
+Serves the repository search with Link header pagination and ETags, the
+latest release of repositories and the GraphQL queries of fetch_github_releases,
+with a configurable latency per request. Repositories are pushed, created and
+deleted with requests to /_fake/repos/<owner>/<name>.
+
+The rate limits of the core, search and graphql resources are counted down
+per request and reset after a window, an exhausted limit is answered with 403
+like GitHub does. Secondary rate limits are simulated by answering every n-th
+request with 429 and a Retry-After header.
+
+Run as a script, the server is started in the foreground for the integration
+tests, its URL is written to the file given with --url-file. It exits once no
+request came in for --idle-timeout seconds.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Timestamp format of the GitHub API, sorts like the time it represents
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Repository fields resolved by the GraphQL queries of fetch_github_releases
+REPOSITORY_ALIAS_RE = re.compile(r'(\w+): repository\(owner: \$(\w+), name: \$(\w+)\)')
+
+# Extra fields padding the search items to the size of real responses
+PADDING_FIELDS = [f"{name}_url" for name in (
+    'archive', 'assignees', 'blobs', 'branches', 'collaborators', 'comments', 'commits',
+    'compare', 'contents', 'contributors', 'deployments', 'downloads', 'events', 'forks',
+    'git_commits', 'git_refs', 'git_tags', 'hooks', 'issue_comment', 'issue_events', 'issues',
+    'keys', 'labels', 'languages', 'merges', 'milestones', 'notifications', 'pulls', 'releases',
+    'stargazers', 'statuses', 'subscribers', 'subscription', 'tags', 'teams', 'trees',
+)]
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    """
+    Fake GitHub API server, used as a context manager running in a background thread.
+
+    Args:
+        repos: Number of repositories of the owner.
+        latency: Seconds every request is delayed.
+        owner: Name of the owner of the repositories.
+        max_results: Maximum number of search results, like the GitHub search API.
+        rate_limits: Requests per window of the core, search and graphql resources.
+        rate_limit_window: Seconds until the rate limits reset.
+        throttle_every: Answer every n-th request with 429, 0 to disable.
+        retry_after: Seconds sent in the Retry-After header of throttled requests.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, repos=1000, latency=0.05, owner='bench', max_results=1000,
+                 rate_limits=None, rate_limit_window=3600, throttle_every=0, retry_after=1):
+        super().__init__(('127.0.0.1', 0), FakeGitHubHandler)
+        self.latency = latency
+        self.owner = owner
+        self.max_results = max_results
+        self.rate_limits = {'core': 5000, 'search': 5000, 'graphql': 5000}
+        self.rate_limits.update(rate_limits or {})
+        self.rate_limit_window = rate_limit_window
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.throttled = 0
+        self._buckets = {}
+        self.items = [self._repo(index) for index in range(repos)]
+        self.by_name = {item['full_name']: item for item in self.items}
+        self.requests = 0
+        self.timed_out = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the fake API."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def _repo(self, index, name=None):
+        name = name or f"ansible-role-bench_{index:05d}"
+        full_name = f"{self.owner}/{name}"
+        item = {
+            'id': index + 1,
+            'name': name,
+            'full_name': full_name,
+            'private': False,
+            'owner': {'login': self.owner, 'id': 1, 'type': 'Organization'},
+            'html_url': f"https://github.com/{full_name}",
+            'description': f"Synthetic role {name}.",
+            'clone_url': f"https://github.com/{full_name}.git",
+            'pushed_at': '2024-01-01T00:00:00Z',
+            'updated_at': '2024-01-01T00:00:00Z',
+            'stargazers_count': index % 50,
+            'default_branch': 'main',
+        }
+        for field in PADDING_FIELDS:
+            item[field] = f"https://api.github.com/repos/{full_name}/{field[:-4]}"
+        return item
+
+    def search(self, query, sort=None):
+        """
+        Returns the items matching the name term and the owner and pushed qualifiers of a query.
+
+        Items are sorted by their last update with sort=updated, like GitHub does.
+        """
+        terms = query.split()
+        names = [term for index, term in enumerate(terms)
+                 if ':' not in term and terms[index + 1:index + 2] == ['in:name']]
+        owners = [term.split(':', 1)[1] for term in terms if term.startswith(('org:', 'user:'))]
+        pushed = [term[len('pushed:>='):] for term in terms if term.startswith('pushed:>=')]
+        with self._lock:
+            items = [
+                item for item in self.items
+                if all(name.lower() in item['name'].lower() for name in names)
+                and all(owner == item['owner']['login'] for owner in owners)
+                and all(item['pushed_at'] >= since for since in pushed)
+            ]
+        if sort == 'updated':
+            items.sort(key=lambda item: item['updated_at'], reverse=True)
+        return items
+
+    def push(self, name):
+        """Records a push to the repository name of the owner, creating it if it is missing."""
+        now = time.strftime(TIME_FORMAT, time.gmtime())
+        with self._lock:
+            item = self.by_name.get(f"{self.owner}/{name}")
+            if item is None:
+                item = self._repo(max((item['id'] for item in self.items), default=0), name)
+                self.items.append(item)
+                self.by_name[item['full_name']] = item
+            item.update(pushed_at=now, updated_at=now)
+            return item
+
+    def delete(self, name):
+        """Deletes the repository name of the owner, returns whether it existed."""
+        with self._lock:
+            item = self.by_name.pop(f"{self.owner}/{name}", None)
+            if item is not None:
+                self.items.remove(item)
+            return item is not None
+
+    @staticmethod
+    def latest_release(item):
+        """Returns the tag name of the latest release of an item, every tenth has none."""
+        index = item['id'] - 1
+        return None if index % 10 == 9 else f"v1.{index}.0"
+
+    def handle_timeout(self):
+        """Stops serving requests with handle_request once no request came in for timeout seconds."""
+        self.timed_out = True
+
+    def count_request(self):
+        """Counts a request and returns the total number of requests."""
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def throttle(self, number):
+        """Returns whether request number hits the simulated secondary rate limit."""
+        if not self.throttle_every or number % self.throttle_every:
+            return False
+        with self._lock:
+            self.throttled += 1
+        return True
+
+    def rate_limit(self, resource):
+        """
+        Counts a request against the rate limit of resource.
+
+        Returns:
+            A tuple of the limit, the remaining requests, the reset time and
+            whether the limit was already exhausted.
+        """
+        with self._lock:
+            now = time.time()
+            bucket = self._buckets.get(resource)
+            if bucket is None or now >= bucket['reset']:
+                bucket = self._buckets[resource] = {
+                    'remaining': self.rate_limits[resource],
+                    'reset': math.ceil(now + self.rate_limit_window),
+                }
+            exceeded = bucket['remaining'] <= 0
+            if not exceeded:
+                bucket['remaining'] -= 1
+            return self.rate_limits[resource], bucket['remaining'], bucket['reset'], exceeded
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Request handler of FakeGitHub."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, Nagle would delay the body
+    disable_nagle_algorithm = True
+    # Rate limit headers of the current request, none for the /_fake endpoints
+    rate_limit_headers = {}
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in self.rate_limit_headers.items():
+            self.send_header(name, value)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _admit(self, resource):
+        """
+        Applies the rate limits to a request, answering it if it is rejected.
+
+        Returns:
+            True if the request may be served.
+        """
+        self.rate_limit_headers = {}
+        if self.server.throttle(self.server.count_request()):
+            self._send(429, b'{"message": "You have exceeded a secondary rate limit."}',
+                       {'Retry-After': str(self.server.retry_after)})
+            return False
+        limit, remaining, reset, exceeded = self.server.rate_limit(resource)
+        self.rate_limit_headers = {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset),
+            'X-RateLimit-Resource': resource,
+        }
+        if exceeded:
+            self._send(403, b'{"message": "API rate limit exceeded."}')
+            return False
+        return True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serves the repository search and the latest releases."""
+        url = urlparse(self.path)
+        if not self._admit('search' if url.path.startswith('/search/') else 'core'):
+            return
+        time.sleep(self.server.latency)
+        if url.path == '/search/repositories':
+            self._search(parse_qs(url.query))
+        elif url.path.startswith('/repos/') and url.path.endswith('/releases/latest'):
+            self._latest_release('/'.join(url.path.split('/')[2:4]))
+        else:
+            self._send(404, b'{"message": "Not Found"}')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Serves the GraphQL API and pushes to repositories."""
+        self.rate_limit_headers = {}
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        path = urlparse(self.path).path
+        if not self._fake_repo(path) and not self._admit('graphql'):
+            return
+        time.sleep(self.server.latency)
+        if self._fake_repo(path):
+            item = self.server.push(self._fake_repo(path))
+            self._send(200, json.dumps(item).encode('utf-8'), {'Content-Type': 'application/json'})
+            return
+        if path != '/graphql':
+            self._send(404, b'{"message": "Not Found"}')
+            return
+        request = json.loads(body or b'{}')
+        variables = request.get('variables') or {}
+        if 'q' in variables:
+            result = self._graphql_search(variables)
+        else:
+            result = self._graphql_repositories(request.get('query', ''), variables)
+        self._send(200, json.dumps(result).encode('utf-8'), {'Content-Type': 'application/json'})
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Deletes repositories."""
+        self.rate_limit_headers = {}
+        name = self._fake_repo(urlparse(self.path).path)
+        if name and self.server.delete(name):
+            self._send(204)
+        else:
+            self._send(404, b'{"message": "Not Found"}')
+
+    def _fake_repo(self, path):
+        """Returns the repository name of a /_fake/repos/<owner>/<name> path, None for others."""
+        prefix = f"/_fake/repos/{self.server.owner}/"
+        return path[len(prefix):] if path.startswith(prefix) and len(path) > len(prefix) else None
+
+    def _node(self, item):
+        tag = self.server.latest_release(item)
+        return {'nameWithOwner': item['full_name'],
+                'latestRelease': {'tagName': tag} if tag else None}
+
+    def _graphql_search(self, variables):
+        """Answers the paginated repository search, cursors are opaque offsets."""
+        items = self.server.search(variables['q'])[:self.server.max_results]
+        after = variables.get('after')
+        start = int(after.split(':', 1)[1]) if after else 0
+        end = min(start + min(int(variables.get('first') or 100), 100), len(items))
+        return {'data': {'search': {
+            'pageInfo': {'hasNextPage': end < len(items), 'endCursor': f"cursor:{end}"},
+            'nodes': [self._node(item) for item in items[start:end]],
+        }}}
+
+    def _graphql_repositories(self, query, variables):
+        """Answers the aliased repository lookups, unknown ones are NOT_FOUND errors."""
+        data = {}
+        errors = []
+        for alias, owner, name in REPOSITORY_ALIAS_RE.findall(query):
+            full_name = f"{variables.get(owner)}/{variables.get(name)}"
+            item = self.server.by_name.get(full_name)
+            data[alias] = self._node(item) if item else None
+            if not item:
+                errors.append({
+                    'type': 'NOT_FOUND',
+                    'path': [alias],
+                    'message': f"Could not resolve to a Repository with the name '{full_name}'.",
+                })
+        result = {'data': data}
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def _search(self, params):
+        per_page = min(int(params.get('per_page', ['30'])[0]), 100)
+        page = int(params.get('page', ['1'])[0])
+        matches = self.server.search(params.get('q', [''])[0], params.get('sort', [None])[0])
+        items = matches[:self.server.max_results]
+        last = max(1, -(-len(items) // per_page))
+        body = json.dumps({
+            'total_count': len(matches),
+            'incomplete_results': False,
+            'items': items[(page - 1) * per_page:page * per_page],
+        }).encode('utf-8')
+
+        etag = f'"{sha256(body).hexdigest()[:32]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, headers={'ETag': etag})
+            return
+
+        query = urlencode({key: values[0] for key, values in params.items() if key != 'page'})
+        links = [f'<{self.server.url}/search/repositories?{query}&page={last}>; rel="last"']
+        if page < last:
+            links.insert(0, f'<{self.server.url}/search/repositories?{query}&page={page + 1}>; '
+                            'rel="next"')
+        self._send(200, body, {'ETag': etag, 'Link': ', '.join(links),
+                               'Content-Type': 'application/json'})
+
+    def _latest_release(self, full_name):
+        item = self.server.by_name.get(full_name)
+        tag = self.server.latest_release(item) if item else None
+        if not tag:
+            self._send(404, b'{"message": "Not Found"}')
+            return
+        body = json.dumps({'tag_name': tag}).encode('utf-8')
+        self._send(200, body, {'Content-Type': 'application/json'})
+
+
+def main():
+    """Serves the fake API in the foreground until it is idle."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n', 1)[0])
+    parser.add_argument('--repos', type=int, default=250, help="number of repositories")
+    parser.add_argument('--owner', default='bench', help="owner of the repositories")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds every request is delayed")
+    parser.add_argument('--url-file', required=True,
+                        help="file the URL of the server is written to once it listens")
+    parser.add_argument('--idle-timeout', type=float, default=10.0,
+                        help="seconds without a request after which the server exits")
+    for resource in ('core', 'search', 'graphql'):
+        parser.add_argument(f'--{resource}-limit', type=int, default=5000,
+                            help=f"requests per window of the {resource} rate limit")
+    parser.add_argument('--rate-limit-window', type=float, default=3600.0,
+                        help="seconds until the rate limits reset")
+    parser.add_argument('--throttle-every', type=int, default=0,
+                        help="answer every n-th request with 429 and Retry-After")
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help="seconds sent in the Retry-After header of throttled requests")
+    args = parser.parse_args()
+
+    server = FakeGitHub(
+        repos=args.repos, latency=args.latency, owner=args.owner,
+        rate_limits={'core': args.core_limit, 'search': args.search_limit,
+                     'graphql': args.graphql_limit},
+        rate_limit_window=args.rate_limit_window, throttle_every=args.throttle_every,
+        retry_after=args.retry_after,
+    )
+    tmp_path = f"{args.url_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(server.url)
+    os.replace(tmp_path, args.url_file)
+    server.timeout = args.idle_timeout
+    try:
+        while not server.timed_out:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
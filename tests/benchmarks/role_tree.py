@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generates synthetic trees of Ansible roles for the benchmarks.
+
+Every role gets a C(defaults/main.yml) with a realistic mix of scalar, list and
+dictionary variables, a C(meta/main.yml) with galaxy_info and dependencies on
+other roles of the tree and a C(tasks/main.yml). The tree only depends on the
+number of roles and the seed, so timings of different runs are comparable.
+"""
+
+import os
+import random
+
+import yaml
+
+ROLE_PREFIX = 'ansible-role-'
+
+PLATFORMS = ['Debian', 'Ubuntu', 'EL', 'Fedora', 'ArchLinux', 'opensuse']
+TAGS = ['system', 'web', 'database', 'monitoring', 'security', 'networking', 'container',
+        'development', 'backup', 'logging']
+PACKAGES = ['curl', 'git', 'htop', 'jq', 'nginx', 'openssl', 'postgresql', 'python3', 'rsync',
+            'tmux', 'unzip', 'vim']
+
+
+def role_name(index):
+    """Returns the name of the role with the given index, without prefix."""
+    return f"bench_{index:05d}"
+
+
+def role_defaults(rng, name):
+    """Returns the defaults of a role."""
+    defaults = {
+        f"{name}_enabled": True,
+        f"{name}_state": 'present',
+        f"{name}_version": f"{rng.randint(1, 5)}.{rng.randint(0, 20)}.{rng.randint(0, 9)}",
+        f"{name}_port": rng.randint(1024, 65535),
+        f"{name}_timeout": rng.choice([1.5, 5.0, 30.0]),
+        f"{name}_config_dir": f"/etc/{name}",
+        f"{name}_packages": rng.sample(PACKAGES, rng.randint(1, 6)),
+        f"{name}_extra_args": [],
+        f"{name}_options": None,
+        f"{name}_config": {
+            'log_level': rng.choice(['debug', 'info', 'warning']),
+            'workers': rng.randint(1, 16),
+            'listen': [f"0.0.0.0:{rng.randint(1024, 65535)}" for _ in range(rng.randint(1, 3))],
+            'tls': {'enabled': rng.random() < 0.5, 'cert': f"/etc/ssl/{name}.pem"},
+        },
+        f"{name}_users": [
+            {'name': f"user{user}", 'uid': 1000 + user, 'groups': ['users'], 'shell': '/bin/bash'}
+            for user in range(rng.randint(0, 5))
+        ],
+    }
+    for extra in range(rng.randint(5, 25)):
+        defaults[f"{name}_setting_{extra}"] = rng.choice(
+            ['value', 42, False, ['a', 'b'], {'key': 'value'}]
+        )
+    return defaults
+
+
+def role_meta(rng, name, index):
+    """Returns the meta data of a role, depending on up to three roles with a lower index."""
+    dependencies = []
+    if index > 0:
+        for dependency in sorted(rng.sample(range(index), min(index, rng.randint(0, 3)))):
+            # Mix the spellings used for dependencies in meta/main.yml
+            spelling = rng.randint(0, 2)
+            if spelling == 0:
+                dependencies.append(role_name(dependency))
+            elif spelling == 1:
+                dependencies.append({'role': f"bench.roles.{role_name(dependency)}"})
+            else:
+                dependencies.append({'name': role_name(dependency), 'vars': {'enabled': True}})
+    return {
+        'galaxy_info': {
+            'role_name': name,
+            'author': 'Benchmark',
+            'description': f"Synthetic role {name}.",
+            'license': 'MIT',
+            'min_ansible_version': '2.15',
+            'platforms': [
+                {'name': platform, 'versions': ['all']}
+                for platform in rng.sample(PLATFORMS, rng.randint(1, 3))
+            ],
+            'galaxy_tags': rng.sample(TAGS, rng.randint(1, 4)),
+        },
+        'dependencies': dependencies,
+    }
+
+
+def write_yaml(path, data):
+    """Writes data as YAML, creating the parent directories."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('---\n')
+        yaml.safe_dump(data, file, default_flow_style=False, sort_keys=False)
+
+
+def generate_role_tree(base_path, count, seed=0):
+    """
+    Generates count roles below base_path.
+
+    Args:
+        base_path: Directory the role directories are created in.
+        count: Number of roles to generate.
+        seed: Seed of the random generator.
+
+    Returns:
+        A list with the paths of the generated roles.
+    """
+    rng = random.Random(seed)
+    role_paths = []
+    for index in range(count):
+        name = role_name(index)
+        role_path = os.path.join(base_path, f"{ROLE_PREFIX}{name}")
+        write_yaml(os.path.join(role_path, 'defaults', 'main.yml'), role_defaults(rng, name))
+        write_yaml(os.path.join(role_path, 'meta', 'main.yml'), role_meta(rng, name, index))
+        write_yaml(os.path.join(role_path, 'tasks', 'main.yml'), [
+            {'name': f"Install {name} packages",
+             'ansible.builtin.package': {'name': f"{{{{ {name}_packages }}}}"}},
+        ])
+        role_paths.append(role_path)
+    return role_paths
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks of the plugins of the jomrr.dev collection.
+
+Times the inventory plugin and generate_argument_specs on synthetic role trees,
+the to_lintable_yaml filter on large objects, fetch_github_repos and the
+github_version lookup against a local fake GitHub API and the import time of
+the plugins. The results are written as JSON, so runs can be compared to track
+regressions.
+
+Usage:
+    python tests/benchmarks/run_benchmarks.py --sizes 100 1000 5000 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+COLLECTION_DIR = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+# Plugins timed by the startup benchmark, with the modules Ansible has already
+# imported when it loads them: the plugin framework on the controller and
+# AnsibleModule in the AnsiballZ payload of a module
+CONTROLLER_PRELOAD = ['ansible.plugins.loader', 'ansible.plugins.filter',
+                      'ansible.plugins.inventory', 'ansible.plugins.lookup', 'ansible.template']
+MODULE_PRELOAD = ['ansible.module_utils.basic']
+STARTUP_PLUGINS = {
+    'filter/common': CONTROLLER_PRELOAD,
+    'inventory/ansible_role_inventory': CONTROLLER_PRELOAD,
+    'lookup/github_version': CONTROLLER_PRELOAD,
+    'modules/fetch_github_releases': MODULE_PRELOAD,
+    'modules/fetch_github_repos': MODULE_PRELOAD,
+    'modules/generate_argument_specs': MODULE_PRELOAD,
+    'modules/lintable_yaml': MODULE_PRELOAD,
+}
+
+# Dependencies reported when a plugin imports them
+THIRD_PARTY = {'requests', 'urllib3', 'yaml'}
+
+# Run in a fresh interpreter, prints the import time and the newly imported modules
+STARTUP_SCRIPT = """
+import importlib, json, sys, time
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+loaded = set(sys.modules)
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps([time.perf_counter() - start, sorted(set(sys.modules) - loaded)]))
+"""
+
+# pylint: disable=wrong-import-position
+from fake_github import FakeGitHub
+from role_tree import ROLE_PREFIX, generate_role_tree
+
+
+def collections_path(work_dir):
+    """
+    Returns a collections path containing this collection as jomrr.dev.
+
+    A checkout outside of an ansible_collections/jomrr/dev directory is linked
+    into work_dir.
+    """
+    parts = COLLECTION_DIR.split(os.sep)
+    if parts[-3:] == ['ansible_collections', 'jomrr', 'dev']:
+        return os.sep.join(parts[:-3])
+    namespace_dir = os.path.join(work_dir, 'collections', 'ansible_collections', 'jomrr')
+    os.makedirs(namespace_dir, exist_ok=True)
+    os.symlink(COLLECTION_DIR, os.path.join(namespace_dir, 'dev'))
+    return os.path.join(work_dir, 'collections')
+
+
+def measure(func, repeat, setup=None):
+    """
+    Runs func repeat times and returns the statistics of the wall times in seconds.
+
+    Args:
+        func: The function to time.
+        repeat: Number of timed runs.
+        setup: Function run untimed before every run.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def summarize(times):
+    """Returns the statistics of a list of wall times in seconds."""
+    return {
+        'runs': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'max': max(times),
+    }
+
+
+class BenchmarkRun():
+    """Collects the results of the benchmarks of one run."""
+
+    def __init__(self, args, work_dir):
+        self.args = args
+        self.work_dir = work_dir
+        self.results = []
+
+    def record(self, name, params, stats):
+        """Records and prints the result of a benchmark."""
+        self.results.append({'name': name, 'params': params, **stats})
+        print(f"{name:40} {json.dumps(params):45} median {stats['median'] * 1000:10.1f} ms",
+              file=sys.stderr)
+
+    def role_tree(self, size):
+        """Returns the base path of a generated tree of size roles."""
+        base_path = os.path.join(self.work_dir, f"roles_{size}")
+        if not os.path.isdir(base_path):
+            generate_role_tree(base_path, size, seed=self.args.seed)
+        return base_path
+
+    def bench_inventory(self, size):
+        """Times the parse of the inventory plugin, without and with its metadata index."""
+        # pylint: disable=import-outside-toplevel
+        from ansible.inventory.data import InventoryData
+        from ansible.parsing.dataloader import DataLoader
+        from ansible.plugins.loader import inventory_loader
+
+        base_path = self.role_tree(size)
+        index_dir = os.path.join(self.work_dir, f"inventory_index_{size}")
+        source = os.path.join(self.work_dir, f"inventory_{size}.yml")
+        with open(source, 'w', encoding='utf-8') as file:
+            json.dump({
+                'plugin': 'jomrr.dev.ansible_role_inventory',
+                'base_path': [base_path],
+                'search_prefix': ROLE_PREFIX,
+                'galaxy_tag_groups': True,
+                'role_defaults': True,
+                'dependency_levels': True,
+                'metadata_index_dir': index_dir,
+            }, file)
+
+        def parse():
+            plugin = inventory_loader.get('jomrr.dev.ansible_role_inventory')
+            plugin.parse(InventoryData(), DataLoader(), source, cache=False)
+
+        def clear_index():
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+        self.record('inventory_parse', {'roles': size, 'index': 'cold'},
+                    measure(parse, self.args.repeat, setup=clear_index))
+        parse()
+        self.record('inventory_parse', {'roles': size, 'index': 'warm'},
+                    measure(parse, self.args.repeat))
+
+    def bench_argument_specs(self, size):
+        """Times generate_argument_specs on all roles, regenerating and up to date."""
+        # pylint: disable=import-outside-toplevel
+        from ansible_collections.jomrr.dev.plugins.modules import generate_argument_specs
+
+        base_path = self.role_tree(size)
+        role_paths = generate_argument_specs.find_roles(base_path)
+
+        def process():
+            results = generate_argument_specs.process_roles(role_paths)
+            failed = [result for result in results if result['failed']]
+            if failed:
+                raise RuntimeError(failed[0]['message'])
+
+        def remove_specs():
+            for role_path in role_paths:
+                specs = os.path.join(role_path, 'meta', 'argument_specs.yml')
+                if os.path.exists(specs):
+                    os.remove(specs)
+
+        self.record('generate_argument_specs', {'roles': size, 'state': 'missing'},
+                    measure(process, self.args.repeat, setup=remove_specs))
+        self.record('generate_argument_specs', {'roles': size, 'state': 'up_to_date'},
+                    measure(process, self.args.repeat))
+
+    def bench_lintable_yaml(self, size):
+        """
+        Times to_lintable_yaml on a config structure of size entries.
+
+        The templated mode renders the filter on the structure loaded from a vars
+        file, as playbooks do, instead of calling it with plain dicts and lists.
+        """
+        # pylint: disable=import-outside-toplevel
+        import yaml
+        from ansible.parsing.dataloader import DataLoader
+        from ansible.template import Templar
+        try:
+            from ansible.template import trust_as_template
+        except ImportError:
+            # Templates are only trusted explicitly since ansible-core 2.19
+            def trust_as_template(template):
+                return template
+        from ansible_collections.jomrr.dev.plugins.filter.common import MyDumper, to_lintable_yaml
+        from ansible_collections.jomrr.dev.plugins.module_utils.lintable_yaml import (
+            iter_lintable_yaml)
+
+        data = {
+            'packages': [
+                {'name': f"package{index}", 'version': f"1.{index}.0", 'arch': 'x86_64',
+                 'depends': [f"lib{dependency}" for dependency in range(index % 5)],
+                 'files': {'count': index, 'paths': [f"/usr/lib/package{index}"]}}
+                for index in range(size)
+            ],
+        }
+
+        self.record('to_lintable_yaml', {'entries': size, 'mode': 'pure_python'},
+                    measure(lambda: yaml.dump(data, Dumper=MyDumper, default_flow_style=False,
+                                              sort_keys=False), self.args.repeat))
+        self.record('to_lintable_yaml', {'entries': size, 'mode': 'filter'},
+                    measure(lambda: to_lintable_yaml(data), self.args.repeat))
+        loader = DataLoader()
+        templar = Templar(loader=loader, variables={'data': loader.load(yaml.safe_dump(data))})
+        template = trust_as_template('{{ data | jomrr.dev.to_lintable_yaml }}')
+        self.record('to_lintable_yaml', {'entries': size, 'mode': 'templated'},
+                    measure(lambda: templar.template(template), self.args.repeat))
+        to_lintable_yaml(data, memoize=True)
+        self.record('to_lintable_yaml', {'entries': size, 'mode': 'memoized'},
+                    measure(lambda: to_lintable_yaml(data, memoize=True), self.args.repeat))
+        self.record('to_lintable_yaml', {'entries': size, 'mode': 'streamed'},
+                    measure(lambda: sum(len(chunk) for chunk in iter_lintable_yaml([data])),
+                            self.args.repeat))
+
+    def bench_fetch_repos(self):
+        """Times fetching and revalidating the repository search against the fake API."""
+        # pylint: disable=import-outside-toplevel
+        from ansible_collections.jomrr.dev.plugins.module_utils.github import GitHubClient
+        from ansible_collections.jomrr.dev.plugins.modules import fetch_github_repos
+
+        with FakeGitHub(repos=self.args.repos, latency=self.args.latency) as server:
+            for workers in (1, 4):
+                client = GitHubClient(max_workers=workers, api_url=server.url)
+
+                def fetch(client=client, workers=workers):
+                    return fetch_github_repos.fetch_repos(client, server.owner, True,
+                                                          'ansible-role-', max_workers=workers)
+
+                params = {'repos': self.args.repos, 'latency': self.args.latency,
+                          'workers': workers}
+                self.record('fetch_repos', params, measure(fetch, self.args.repeat))
+
+                _, validators = fetch()
+                query = fetch_github_repos.build_query(server.owner, True, 'ansible-role-')
+                self.record('fetch_repos_revalidate', params, measure(
+                    lambda client=client, workers=workers: fetch_github_repos.is_modified(
+                        client, query, validators, max_workers=workers),
+                    self.args.repeat))
+                client.close()
+
+    def bench_github_version(self):
+        """Times the github_version lookup against the fake API, uncached and cached."""
+        # pylint: disable=import-outside-toplevel
+        from ansible.plugins.loader import lookup_loader
+
+        cache_dir = os.path.join(self.work_dir, 'github_version_cache')
+        with FakeGitHub(repos=self.args.repos, latency=self.args.latency) as server:
+            repos = [f"{server.owner}/{item['name']}" for item in server.items[:self.args.lookups]]
+            for workers in (1, 8, 16):
+                lookup = lookup_loader.get('jomrr.dev.github_version')
+                params = {'repos': len(repos), 'latency': self.args.latency, 'workers': workers}
+                self.record('github_version', dict(params, cache='disabled'), measure(
+                    lambda lookup=lookup, workers=workers: lookup.run(
+                        repos, github_token='', workers=workers, api_url=server.url,
+                        cache_timeout=0),
+                    self.args.repeat))
+
+            lookup = lookup_loader.get('jomrr.dev.github_version')
+            options = {'github_token': '', 'api_url': server.url,
+                       'cache_connection': cache_dir, 'cache_timeout': 3600}
+            lookup.run(repos, **options)
+            self.record('github_version', {'repos': len(repos), 'cache': 'warm'},
+                        measure(lambda: lookup.run(repos, **options), self.args.repeat))
+
+    def bench_startup(self, collections_dir):
+        """
+        Times importing each plugin in a fresh interpreter, on top of what Ansible already imported.
+
+        The import time is paid whenever a plugin is loaded, by every fork on the
+        controller and by every module run on a target.
+        """
+        env = dict(os.environ, PYTHONPATH=collections_dir)
+        for plugin, preload in STARTUP_PLUGINS.items():
+            module = f"ansible_collections.jomrr.dev.plugins.{plugin.replace('/', '.')}"
+            times = []
+            for _ in range(self.args.startup_repeat):
+                output = subprocess.run(
+                    [sys.executable, '-c', STARTUP_SCRIPT, module, *preload],
+                    env=env, check=True, capture_output=True, text=True
+                ).stdout
+                seconds, imported = json.loads(output)
+                times.append(seconds)
+            third_party = sorted({name.split('.')[0] for name in imported} & THIRD_PARTY)
+            self.record('startup', {'plugin': plugin, 'modules_imported': len(imported),
+                                    'third_party': third_party}, summarize(times))
+
+
+BENCHMARKS = ['inventory', 'argument_specs', 'lintable_yaml', 'fetch_repos', 'github_version',
+              'startup']
+
+
+def main():
+    """Runs the selected benchmarks and writes the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                        help='Numbers of roles of the synthetic role trees.')
+    parser.add_argument('--yaml-sizes', type=int, nargs='+', default=[1000, 10000],
+                        help='Numbers of entries of the objects dumped with to_lintable_yaml.')
+    parser.add_argument('--repos', type=int, default=1000,
+                        help='Number of repositories served by the fake GitHub API.')
+    parser.add_argument('--lookups', type=int, default=100,
+                        help='Number of repositories resolved by the github_version lookup.')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Latency of the fake GitHub API in seconds.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark.')
+    parser.add_argument('--startup-repeat', type=int, default=10,
+                        help='Fresh interpreters started per plugin by the startup benchmark.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic role trees.')
+    parser.add_argument('--only', nargs='+',
+                        choices=BENCHMARKS, help='Run only the given benchmarks.')
+    parser.add_argument('--output', help='File the JSON results are written to, default stdout.')
+    args = parser.parse_args()
+    selected = set(args.only or BENCHMARKS)
+
+    work_dir = tempfile.mkdtemp(prefix='jomrr_dev_benchmarks_')
+    try:
+        # pylint: disable=import-outside-toplevel
+        from ansible import __version__ as ansible_version
+        from ansible.plugins.loader import init_plugin_loader
+        collections_dir = collections_path(work_dir)
+        init_plugin_loader([collections_dir])
+
+        run = BenchmarkRun(args, work_dir)
+        for size in args.sizes:
+            if 'inventory' in selected:
+                run.bench_inventory(size)
+            if 'argument_specs' in selected:
+                run.bench_argument_specs(size)
+        if 'lintable_yaml' in selected:
+            for size in args.yaml_sizes:
+                run.bench_lintable_yaml(size)
+        if 'fetch_repos' in selected:
+            run.bench_fetch_repos()
+        if 'github_version' in selected:
+            run.bench_github_version()
+        if 'startup' in selected:
+            run.bench_startup(collections_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'ansible': ansible_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': run.results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()